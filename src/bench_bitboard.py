@@ -0,0 +1,34 @@
+import argparse
+
+from benchmarks.helpers import construction_mb, steps_per_sec
+
+
+# ==============================================================================
+# БЕНЧМАРК МАСШТАБИРОВАНИЯ: SnakeEnv (сетка + таблицы лучей) против битбордов
+# ==============================================================================
+def run(sizes=(10, 20, 50, 100, 200), fill: float = 0.1, steps: int = 2000, grid_max: int = 100,
+        trap_mode: str = "trapped"):
+    """ trap_mode="count" сравнивает точный подсчёт достижимых клеток: BFS по сетке против заливки сдвигами """
+    print(f"{'поле':>9} {'длина':>6} {'grid, шаг/с':>12} {'bitboard, шаг/с':>16} "
+          f"{'grid, МБ':>9} {'bitboard, МБ':>13}")
+    for size in sizes:
+        length = max(3, int(size * size * fill))
+        bitboard = steps_per_sec("bitboard", size, length, steps, trap_mode)
+        bitboard_mb = construction_mb("bitboard", size)
+        if size <= grid_max:
+            grid = f"{steps_per_sec('grid', size, length, steps, trap_mode):>12.0f}"
+            grid_mb = f"{construction_mb('grid', size):>9.1f}"
+        else:
+            grid, grid_mb = f"{'-':>12}", f"{'-':>9}"  # Таблица лучей растёт как size^3
+        print(f"{size:>4}x{size:<4} {length:>6} {grid} {bitboard:>16.0f} {grid_mb} {bitboard_mb:>13.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Скорость шага и память среды в зависимости от размера поля")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 20, 50, 100, 200])
+    parser.add_argument("--fill", type=float, default=0.1, help="доля поля под змейкой")
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--trap-mode", choices=["trapped", "count"], default="trapped")
+    parser.add_argument("--grid-max", type=int, default=100, help="SnakeEnv только до этого размера")
+    args = parser.parse_args()
+    run(args.sizes, args.fill, args.steps, args.grid_max, args.trap_mode)
@@ -0,0 +1,65 @@
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.helpers import episodes_to_target, fill
+from replay_buffer import PrioritizedReplayBuffer, ReplayBuffer
+
+
+# ==============================================================================
+# БЕНЧМАРК: равномерная память против приоритетной (PER)
+# ==============================================================================
+def bench_sampling(capacities=(50000, 1000000), batch_size: int = 64, calls: int = 2000):
+    """ Стоимость одного батча: выборка + тензоры (+ обновление приоритетов для PER) """
+    print(f"{'ёмкость':>9} {'uniform, мкс':>13} {'PER, мкс':>10} {'PER update, мкс':>16}")
+    for capacity in capacities:
+        uniform = ReplayBuffer(capacity, seed=0)
+        per = PrioritizedReplayBuffer(capacity, seed=0)
+        fill(uniform, capacity)
+        fill(per, capacity)
+        td = np.random.default_rng(1).random(batch_size)
+
+        start = time.perf_counter()
+        for _ in range(calls):
+            uniform.sample(batch_size)
+        t_uniform = (time.perf_counter() - start) / calls
+
+        start = time.perf_counter()
+        for _ in range(calls):
+            _, idx, _ = per.sample_prioritized(batch_size, beta=0.4)
+        t_per = (time.perf_counter() - start) / calls
+
+        start = time.perf_counter()
+        for _ in range(calls):
+            per.update_priorities(idx, td)
+        t_update = (time.perf_counter() - start) / calls
+
+        print(f"{capacity:>9} {t_uniform * 1e6:>13.1f} {t_per * 1e6:>10.1f} {t_update * 1e6:>16.1f}")
+
+
+def bench_training(target: float, window: int, max_epochs: int, seeds):
+    results = {}
+    for prioritized in (False, True):
+        name = "PER" if prioritized else "uniform"
+        start = time.perf_counter()
+        epochs = [episodes_to_target(prioritized, target, window, max_epochs, s) for s in seeds]
+        results[name] = (epochs, time.perf_counter() - start)
+
+    print(f"\nЭпизодов до среднего счёта {target} (окно {window}, максимум {max_epochs}):")
+    for name, (epochs, elapsed) in results.items():
+        print(f"{name:>8}: {epochs} | медиана {int(np.median(epochs))} | {elapsed:.0f} с")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сравнение равномерной и приоритетной памяти опыта")
+    parser.add_argument("--skip-training", action="store_true", help="только стоимость выборки")
+    parser.add_argument("--target", type=float, default=5.0)
+    parser.add_argument("--window", type=int, default=50)
+    parser.add_argument("--max-epochs", type=int, default=2000)
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 2])
+    args = parser.parse_args()
+
+    bench_sampling()
+    if not args.skip_training:
+        bench_training(args.target, args.window, args.max_epochs, args.seeds)
@@ -0,0 +1,27 @@
+import numpy as np
+
+from benchmarks.helpers import legacy_get_state, make, time_per_call
+
+
+# ==============================================================================
+# МИКРОБЕНЧМАРК: прежний обход лучей против StateEncoder
+# ==============================================================================
+def run(sizes=(10, 20, 50), fills=(0.1, 0.5), calls: int = 2000):
+    print(f"{'поле':>7} {'длина':>6} {'прежний, мкс':>14} {'encoder, мкс':>14} {'ускорение':>10}")
+    for size in sizes:
+        for fill in fills:
+            length = max(3, int(size * size * fill))
+            env = make("grid", size, length)
+            head, food = env._flat(env.snake[0]), env._flat(env.food)
+            # Оба кодировщика обязаны давать одно и то же
+            assert np.array_equal(np.array(legacy_get_state(env), dtype=np.float32),
+                                  env.encoder.encode(env._grid_view, head, food))
+
+            legacy = time_per_call(lambda: legacy_get_state(env), calls)
+            encoder = time_per_call(lambda: env.encoder.encode(env._grid_view, head, food), calls)
+            print(f"{size:>3}x{size:<3} {length:>6} {legacy * 1e6:>14.2f} {encoder * 1e6:>14.2f} "
+                  f"{legacy / encoder:>9.1f}x")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,13 @@
+"""
+Бенчмарки горячих путей: шаг среды, кодирование состояния, выборка из памяти
+опыта, обучение и инференс. Запуск без окна Tk из каталога src:
+
+    python -m benchmarks --out results.json --baseline benchmarks/baseline.json
+
+Общие заготовки (уложенная змейка, прежний кодировщик, заполнение памяти
+опыта) лежат в benchmarks.helpers; скрипты bench_*.py только печатают по ним
+таблицы.
+"""
+from benchmarks.suite import compare, run_all
+
+__all__ = ["compare", "run_all"]
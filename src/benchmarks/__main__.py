@@ -0,0 +1,51 @@
+import argparse
+import json
+import platform
+import sys
+from pathlib import Path
+
+from benchmarks.suite import BENCHMARKS, compare, run_all
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="Бенчмарки среды, обучения и инференса")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="запустить только эти группы")
+    parser.add_argument("--out", default=None, help="куда записать результаты (JSON)")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="JSON с эталонными результатами")
+    parser.add_argument("--update-baseline", action="store_true", help="записать результаты как новый эталон")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="допустимое ухудшение (доля)")
+    args = parser.parse_args()
+
+    results = run_all(args.only)
+    report = {"python": platform.python_version(), "machine": platform.machine(), "results": results}
+
+    for name, metric in results.items():
+        print(f"{name:<40} {metric['value']:>12.4g} {metric['unit']}")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.update_baseline:
+        Path(args.baseline).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        print(f"-> Эталон обновлён: {args.baseline}")
+        return 0
+
+    if not Path(args.baseline).exists():
+        print("-> Эталона нет, сравнение пропущено (см. --update-baseline)")
+        return 0
+
+    baseline = json.loads(Path(args.baseline).read_text())["results"]
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("-> Регрессии:")
+        for line in regressions:
+            print("   " + line)
+        return 1
+    print("-> Регрессий нет")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+import gc
+import random
+import time
+import tracemalloc
+from collections import deque
+from typing import List, Tuple
+
+import numpy as np
+
+from bitboard_env import BitboardSnakeEnv
+from replay_buffer import ReplayBuffer
+from snake_dqn import train_dqn
+from snake_env import SnakeEnv
+
+
+# ==============================================================================
+# ПОЛОЖЕНИЯ НА ПОЛЕ
+# ==============================================================================
+def legacy_get_state(env: SnakeEnv) -> List[float]:
+    """ Прежний _get_state: каждый луч проходится клетка за клеткой при каждом вызове """
+    hr, hc = env.snake[0]
+    grid = env._grid
+    directions = [
+        (-1, 0), (-1, 1), (0, 1), (1, 1),
+        (1, 0), (1, -1), (0, -1), (-1, -1)
+    ]
+    state = []
+    for dr, dc in directions:
+        r, c = hr + dr, hc + dc
+        dist = 1.0
+        body_dist = 0.0
+        while 0 <= r < env.height and 0 <= c < env.width:
+            if body_dist == 0.0 and grid[r * env.width + c]:
+                body_dist = 1.0 / dist
+            r += dr
+            c += dc
+            dist += 1.0
+        state.extend([1.0 / dist, body_dist])
+    state.append(1.0 if env.food[0] < hr else 0.0)
+    state.append(1.0 if env.food[0] > hr else 0.0)
+    state.append(1.0 if env.food[1] < hc else 0.0)
+    state.append(1.0 if env.food[1] > hc else 0.0)
+    return state
+
+
+def serpentine(size: int, length: int) -> List[Tuple[int, int]]:
+    """ Змейка длины length, уложенная по строкам снизу; голова - первая клетка """
+    cells = []
+    for k in range(length):
+        r = size - 1 - k // size
+        c = k % size if (k // size) % 2 == 0 else size - 1 - k % size
+        cells.append((r, c))
+    cells.reverse()
+    return cells
+
+
+def make(kind: str, size: int, length: int, trap_mode: str = "trapped", seed: int = 0):
+    """ SnakeEnv (kind="grid") или BitboardSnakeEnv поля size x size со змейкой из serpentine """
+    cells = serpentine(size, length)
+    if kind == "grid":
+        env = SnakeEnv(width=size, height=size, seed=seed, trap_mode=trap_mode)
+        env.snake = deque(cells)
+    else:
+        env = BitboardSnakeEnv(width=size, height=size, seed=seed, trap_mode=trap_mode)
+        env._body = deque(r * env.stride + c for r, c in cells)
+    env._rebuild_board()
+    env.food = env._place_food()
+    return env
+
+
+# ==============================================================================
+# ИЗМЕРЕНИЯ
+# ==============================================================================
+def time_per_call(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+def construction_mb(kind: str, size: int) -> float:
+    """ Пик памяти Python на создание среды, МБ (у SnakeEnv это в основном таблица лучей) """
+    gc.collect()
+    tracemalloc.start()
+    env = make(kind, size, 3)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del env
+    return peak / 2 ** 20
+
+
+def safe_action(env, rng: random.Random) -> int:
+    """ Случайный ход, который не врезается сразу (чтобы длина змейки держалась) """
+    hr, hc = env.snake[0]
+    body = set(env.snake)
+    moves = [(-1, 0), (0, 1), (1, 0), (0, -1)]
+    safe = [a for a, (dr, dc) in enumerate(moves)
+            if 0 <= hr + dr < env.height and 0 <= hc + dc < env.width and (hr + dr, hc + dc) not in body]
+    return rng.choice(safe) if safe else rng.randint(0, 3)
+
+
+def steps_per_sec(kind: str, size: int, length: int, steps: int, trap_mode: str = "trapped") -> float:
+    """ Шагов env.step в секунду под safe_action (время самой политики не считается) """
+    rng = random.Random(0)
+    env = make(kind, size, length, trap_mode)
+    elapsed = 0.0
+    for _ in range(steps):
+        if env.done:
+            env = make(kind, size, length, trap_mode)
+        action = safe_action(env, rng)
+        start = time.perf_counter()
+        env.step(action)
+        elapsed += time.perf_counter() - start
+    return steps / elapsed
+
+
+# ==============================================================================
+# ПАМЯТЬ ОПЫТА И ОБУЧЕНИЕ
+# ==============================================================================
+def fill(buffer: ReplayBuffer, n: int, chunk: int = 10000) -> ReplayBuffer:
+    """ n случайных переходов пачками по chunk """
+    rng = np.random.default_rng(0)
+    for start in range(0, n, chunk):
+        k = min(chunk, n - start)
+        buffer.add_batch(rng.random((k, buffer.state_dim), dtype=np.float32), rng.integers(0, 4, k),
+                         rng.random(k, dtype=np.float32), rng.random((k, buffer.state_dim), dtype=np.float32),
+                         rng.random(k) < 0.05)
+    return buffer
+
+
+def episodes_to_target(prioritized: bool, target: float, window: int, max_epochs: int, seed: int) -> int:
+    """ Номер эпохи, на которой средний счёт за window эпизодов достиг target (или max_epochs) """
+    scores = deque(maxlen=window)
+    reached = [max_epochs]
+
+    def on_epoch(epoch: int, score: int) -> bool:
+        scores.append(score)
+        if len(scores) == window and sum(scores) / window >= target:
+            reached[0] = epoch + 1
+            return True
+        return False
+
+    train_dqn(epochs=max_epochs, prioritized=prioritized, seed=seed, save_path=None, on_epoch=on_epoch)
+    return reached[0]
@@ -0,0 +1,244 @@
+import copy
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import torch
+import torch.optim as optim
+
+from benchmarks.helpers import fill, legacy_get_state, make, steps_per_sec
+from episode_log import EpisodeLog, record_episodes, replay_transitions
+from lookahead import LookaheadPolicy
+from numpy_policy import NumpyPolicy
+from replay_buffer import PrioritizedReplayBuffer, ReplayBuffer
+from snake_dqn import QNetwork, SnakeEnv, dqn_update
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+MODEL_PATH = SRC_DIR / "snake_dqn_model.pth"
+ONNX_PATH = SRC_DIR.parent / "snake_model.onnx"
+
+# Результат: имя метрики -> {"value": ..., "unit": ..., "higher_is_better": ...}
+Results = Dict[str, Dict[str, object]]
+
+
+def _metric(results: Results, name: str, value: float, unit: str, higher_is_better: bool):
+    results[name] = {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+
+
+def _per_call(fn: Callable[[], object], calls: int, repeats: int = 3) -> float:
+    """ Лучшее из repeats среднее время одного вызова, с """
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        best = min(best, (time.perf_counter() - start) / calls)
+    return best
+
+
+# ==============================================================================
+# СРЕДА
+# ==============================================================================
+def bench_env(results: Results, sizes=(10, 20, 50), fills=(0.0, 0.3), steps: int = 5000):
+    """ Шагов в секунду при разных размерах поля и длинах змейки (только время env.step) """
+    for size in sizes:
+        for fraction in fills:
+            length = max(3, int(size * size * fraction))
+            _metric(results, f"env_step/{size}x{size}/len{length}", steps_per_sec("grid", size, length, steps),
+                    "steps/s", True)
+
+
+def bench_state(results: Results, sizes=(10, 20, 50), calls: int = 3000):
+    """ Задержка кодирования состояния: StateEncoder и прежний обход лучей для сравнения """
+    for size in sizes:
+        env = make("grid", size, size * size // 4)
+        head, food = env._flat(env.snake[0]), env._flat(env.food)
+        encoder = _per_call(lambda: env.encoder.encode(env._grid_view, head, food), calls)
+        legacy = _per_call(lambda: legacy_get_state(env), calls)
+        _metric(results, f"state_encode/{size}x{size}", encoder * 1e6, "us", False)
+        _metric(results, f"state_encode_legacy/{size}x{size}", legacy * 1e6, "us", False)
+
+
+def bench_bitboard(results: Results, sizes=(10, 50, 100), fill: float = 0.1, steps: int = 2000):
+    """ Шагов в секунду BitboardSnakeEnv на больших полях (сравнивать с env_step той же длины) """
+    for size in sizes:
+        length = max(3, int(size * size * fill))
+        for trap_mode in ("trapped", "count"):
+            _metric(results, f"bitboard_step/{size}x{size}/len{length}/{trap_mode}",
+                    steps_per_sec("bitboard", size, length, steps, trap_mode), "steps/s", True)
+
+
+def bench_planning(results: Results, size: int = 10, calls: int = 3000, depths=(2, 3), moves: int = 100):
+    """ Снимок и восстановление состояния среды против deepcopy, и скорость поиска на глубину """
+    env = make("grid", size, size * size // 4)
+    snap = env.snapshot()
+    _metric(results, f"planning/snapshot/{size}x{size}", _per_call(env.snapshot, calls) * 1e6, "us", False)
+    _metric(results, f"planning/restore/{size}x{size}", _per_call(lambda: env.restore(snap), calls) * 1e6, "us", False)
+    _metric(results, f"planning/deepcopy/{size}x{size}",
+            _per_call(lambda: copy.deepcopy(env), calls // 10) * 1e6, "us", False)
+
+    if MODEL_PATH.exists():
+        policy = NumpyPolicy.load(str(MODEL_PATH))
+    else:
+        policy = NumpyPolicy({name: tensor.numpy() for name, tensor in QNetwork().state_dict().items()})
+    for depth in depths:
+        planner = LookaheadPolicy(policy, depth)
+        game = SnakeEnv(size, size, seed=0)
+        start = time.perf_counter()
+        for _ in range(moves):
+            if game.done:
+                game = SnakeEnv(size, size, seed=planner.nodes)
+            game.step(planner.plan(game))
+        _metric(results, f"planning/lookahead/d{depth}", planner.nodes / (time.perf_counter() - start),
+                "nodes/s", True)
+
+
+# ==============================================================================
+# ПАМЯТЬ ОПЫТА И ОБУЧЕНИЕ
+# ==============================================================================
+def bench_replay(results: Results, capacity: int = 50000, batch_size: int = 64, calls: int = 2000):
+    """ Выборка батча вместе с превращением в тензоры """
+    uniform = fill(ReplayBuffer(capacity, seed=0), capacity)
+    per = fill(PrioritizedReplayBuffer(capacity, seed=0), capacity)
+    t_uniform = _per_call(lambda: uniform.sample(batch_size), calls)
+    t_per = _per_call(lambda: per.sample_prioritized(batch_size, 0.4), calls)
+    _metric(results, f"replay_sample/uniform/b{batch_size}", t_uniform * 1e6, "us", False)
+    _metric(results, f"replay_sample/per/b{batch_size}", t_per * 1e6, "us", False)
+
+
+def bench_training(results: Results, batch_size: int = 64, updates: int = 300):
+    """ Шагов обучения в секунду: выборка + прямой и обратный проход + Adam """
+    torch.manual_seed(0)
+    model = QNetwork()
+    target_model = copy.deepcopy(model)
+    optimizer = optim.Adam(model.parameters(), lr=0.0005)
+    memory = fill(ReplayBuffer(20000, seed=0), 20000)
+    step = lambda: dqn_update(model, target_model, optimizer, memory.sample(batch_size), 0.98)
+    _metric(results, f"train_updates/b{batch_size}", 1.0 / _per_call(step, updates), "updates/s", True)
+
+
+def bench_episodes(results: Results, episodes: int = 200):
+    """ Размер журнала эпизодов и скорость воспроизведения переходов без сети """
+    policy = NumpyPolicy.load(str(MODEL_PATH)) if MODEL_PATH.exists() else None
+    if policy is None:
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        log = EpisodeLog(str(Path(tmp) / "episodes.snk"))
+        record_episodes(log, policy, range(episodes))
+        size = Path(log.path).stat().st_size + Path(log.index_path).stat().st_size
+        start = time.perf_counter()
+        steps = len(replay_transitions(log, range(episodes))[0])
+        elapsed = time.perf_counter() - start
+        log.close()
+    _metric(results, "episode_log/bytes_per_episode", size / episodes, "B", False)
+    _metric(results, "episode_log/replay", steps / elapsed, "steps/s", True)
+
+
+# ==============================================================================
+# ИНФЕРЕНС
+# ==============================================================================
+def bench_inference(results: Results, batch_sizes=(1, 256), calls: int = 1000):
+    """ Задержка на одно состояние для .pth (torch) и snake_model.onnx (ONNX Runtime) """
+    model = QNetwork()
+    if MODEL_PATH.exists():
+        model.load_state_dict(torch.load(MODEL_PATH, map_location="cpu"))
+    model.eval()
+
+    for batch in batch_sizes:
+        states = torch.from_numpy(np.random.default_rng(0).random((batch, 20), dtype=np.float32))
+        with torch.no_grad():
+            t = _per_call(lambda: model(states), calls)
+        _metric(results, f"inference/torch/b{batch}", t / batch * 1e6, "us/state", False)
+
+    policy = NumpyPolicy({name: tensor.numpy() for name, tensor in model.state_dict().items()})
+    for batch in batch_sizes:
+        states = np.random.default_rng(0).random((batch, 20), dtype=np.float32)
+        t = _per_call(lambda: policy(states), calls)
+        _metric(results, f"inference/numpy/b{batch}", t / batch * 1e6, "us/state", False)
+
+    try:
+        import onnxruntime as ort
+    except ImportError:
+        return
+    if not ONNX_PATH.exists():
+        return
+    session = ort.InferenceSession(str(ONNX_PATH), providers=["CPUExecutionProvider"])
+    model_input = session.get_inputs()[0]
+    for batch in batch_sizes:
+        if model_input.shape[0] == 1 and batch != 1:
+            continue  # Модель экспортирована с фиксированным батчем
+        states = np.random.default_rng(0).random((batch, 20), dtype=np.float32)
+        t = _per_call(lambda: session.run(None, {model_input.name: states}), calls)
+        _metric(results, f"inference/onnx/b{batch}", t / batch * 1e6, "us/state", False)
+
+
+# Что импортирует процесс, которому нужна только игра и политика, и процесс обучения
+_STARTUP_IMPORTS = {
+    "numpy_policy": "import snake_env, numpy_policy",
+    "snake_dqn": "import snake_dqn",
+}
+# Пик памяти - VmHWM из /proc (ru_maxrss дочернего процесса на Linux наследует пик родителя до exec)
+_STARTUP_PROBE = ("import sys, time\n"
+                  "start = time.perf_counter()\n"
+                  "{imports}\n"
+                  "elapsed = time.perf_counter() - start\n"
+                  "try:\n"
+                  "    status = open('/proc/self/status').read()\n"
+                  "    rss = int(status.split('VmHWM:')[1].split()[0]) * 1024\n"
+                  "except OSError:\n"
+                  "    import resource\n"
+                  "    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+                  "print(elapsed, rss)")
+
+
+def bench_startup(results: Results, repeats: int = 3):
+    """ Время импорта и пиковая память свежего процесса """
+    for name, imports in _STARTUP_IMPORTS.items():
+        best_time, rss = float("inf"), 0
+        for _ in range(repeats):
+            out = subprocess.run([sys.executable, "-c", _STARTUP_PROBE.format(imports=imports)],
+                                 cwd=SRC_DIR, capture_output=True, text=True, check=True).stdout.split()
+            best_time, rss = min(best_time, float(out[0])), int(out[1])
+        _metric(results, f"startup/{name}/import", best_time * 1000.0, "ms", False)
+        _metric(results, f"startup/{name}/rss", rss / 2 ** 20, "MB", False)
+
+
+BENCHMARKS: Dict[str, Callable[[Results], None]] = {
+    "env": bench_env,
+    "state": bench_state,
+    "bitboard": bench_bitboard,
+    "planning": bench_planning,
+    "replay": bench_replay,
+    "training": bench_training,
+    "episodes": bench_episodes,
+    "inference": bench_inference,
+    "startup": bench_startup,
+}
+
+
+def run_all(only: Optional[List[str]] = None) -> Results:
+    torch.set_num_threads(1)  # Одинаковые условия от запуска к запуску
+    results: Results = {}
+    for name, bench in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        print(f"-> {name}...")
+        bench(results)
+    return results
+
+
+def compare(results: Results, baseline: Results, tolerance: float = 0.15) -> List[str]:
+    """ Метрики, которые ухудшились относительно baseline больше чем на tolerance """
+    regressions = []
+    for name, metric in results.items():
+        if name not in baseline:
+            continue
+        new, old = float(metric["value"]), float(baseline[name]["value"])
+        ratio = new / old if metric["higher_is_better"] else old / new
+        if ratio < 1.0 - tolerance:
+            regressions.append(f"{name}: {old:.4g} -> {new:.4g} {metric['unit']} ({(1 - ratio) * 100:.0f}% хуже)")
+    return regressions
@@ -0,0 +1,248 @@
+import random
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+import numpy as np
+
+from state_encoder import STATE_SIZE
+
+
+def _comb(count: int, spacing: int) -> int:
+    """ count единичных битов через каждые spacing: сумма 1 << (k * spacing) """
+    return ((1 << (count * spacing)) - 1) // ((1 << spacing) - 1)
+
+
+# ==============================================================================
+# СРЕДА ДЛЯ БОЛЬШИХ ПОЛЕЙ: поле и тело - битборды (целые Python)
+# ==============================================================================
+class BitboardSnakeEnv:
+    """
+    Та же игра, что SnakeEnv (награды, смерть, победа, 20 признаков, порядок
+    вызовов генератора при постановке еды), но без таблиц лучей SnakeEnv
+    размером O(клеток * сторона).
+
+    Клетка (r, c) - бит r * stride + c, где stride = width + 1: лишний столбец
+    всегда пуст и не даёт сдвигам "перетекать" между строками. Тело - один
+    битборд, занятость проверяется сдвигом. Лучи считаются по маскам строк,
+    столбцов и диагоналей (их O(width + height)): ближайшее тело вдоль луча -
+    младший или старший бит пересечения маски с телом. Заливка для точного
+    подсчёта достижимых клеток идёт сдвигами на 1 и на stride.
+
+    Выигрыш - память (остаются битборды и индекс свободных клеток для
+    постановки еды, то есть O(клеток), а не O(клеток * сторона)) и точный
+    режим "count" (в 2.5-7 раз быстрее BFS SnakeEnv). В режиме по умолчанию
+    "trapped" шаг медленнее, чем у SnakeEnv, на всех замеренных размерах:
+    около 41 тыс. против 72 тыс. шагов/с на 100x100 (bench_bitboard).
+    """
+
+    def __init__(self, width: int = 50, height: int = 50, seed: Optional[int] = None,
+                 trap_mode: str = "trapped"):
+        if trap_mode not in ("trapped", "count"):
+            raise ValueError(f"Неизвестный режим '{trap_mode}', ожидается trapped или count")
+        self.width = width
+        self.height = height
+        self.stride = width + 1
+        self.trap_mode = trap_mode
+        self.rng = random.Random(seed)
+
+        # Маски линий собираются сдвигами "гребёнок" (геометрических рядов битов), а не по клетке
+        stride = self.stride
+        self._rows = [((1 << width) - 1) << (r * stride) for r in range(height)]
+        self._board = sum(self._rows)
+        column = _comb(height, stride)
+        self._cols = [column << c for c in range(width)]
+        # Диагональ r - c = d (SE/NW): биты r * (stride + 1) - d; r + c = a (NE/SW): биты r * width + a
+        diagonal, anti_diagonal = _comb(height, stride + 1) << width, _comb(height, width)
+        self._diags = [self._row_band(d, d + width) & (diagonal >> (width + d))
+                       for d in range(-(width - 1), height)]
+        self._antis = [self._row_band(a - width + 1, a + 1) & (anti_diagonal << a)
+                       for a in range(width + height - 1)]
+
+        self.reset()
+
+    def _row_band(self, first: int, last: int) -> int:
+        """ Клетки поля в строках [first, last) """
+        first, last = max(first, 0), min(last, self.height)
+        return self._board & (((1 << (last * self.stride)) - 1) ^ ((1 << (first * self.stride)) - 1))
+
+    # --------------------------------------------------------------------------
+    @property
+    def snake(self) -> Deque[Tuple[int, int]]:
+        """ Тело списком (r, c) от головы к хвосту, как SnakeEnv.snake (собирается за O(длины)) """
+        return deque(divmod(p, self.stride) for p in self._body)
+
+    def reset(self, seed: Optional[int] = None) -> np.ndarray:
+        """ Как SnakeEnv.reset: seed заводит генератор заново """
+        if seed is not None:
+            self.rng.seed(seed)
+        # Спавним змейку так же, как SnakeEnv.reset
+        r0, c0 = self.height // 2, self.width // 2
+        self._body: Deque[int] = deque(r0 * self.stride + c0 + k for k in range(3))
+        self._rebuild_board()
+        self.direction = 3  # 0=ВВЕРХ, 1=ВПРАВО, 2=ВНИЗ, 3=ВЛЕВО
+        self.score = 0
+        self.done = False
+        self.won = False
+        self.death_cause: Optional[str] = None  # См. snake_env.DEATH_CAUSES
+        self.food: Tuple[int, int] = self._place_food()
+        self.steps_without_food = 0
+        return self._get_state()
+
+    def _rebuild_board(self):
+        """ Битборд тела и индекс свободных клеток заново по self._body (от головы к хвосту) """
+        self._bits = 0
+        cells = self.width * self.height
+        self._free: List[int] = list(range(cells))
+        self._free_pos: List[int] = list(range(cells))
+        for p in self._body:
+            self._occupy(p)
+
+    def _occupy(self, p: int):
+        """ Бит тела + удаление из индекса свободных клеток (плоские r * width + c, как в SnakeEnv) """
+        self._bits |= 1 << p
+        r, c = divmod(p, self.stride)
+        pos = r * self.width + c
+        i = self._free_pos[pos]
+        last = self._free.pop()
+        if last != pos:
+            self._free[i] = last
+            self._free_pos[last] = i
+        self._free_pos[pos] = -1
+
+    def _release(self, p: int):
+        self._bits &= ~(1 << p)
+        r, c = divmod(p, self.stride)
+        pos = r * self.width + c
+        self._free_pos[pos] = len(self._free)
+        self._free.append(pos)
+
+    def _place_food(self) -> Tuple[int, int]:
+        return divmod(self._free[self.rng.randrange(len(self._free))], self.width)
+
+    # --------------------------------------------------------------------------
+    def _get_state(self) -> np.ndarray:
+        """ 20 признаков SnakeEnv._get_state: лучи сдвигами по маскам линий """
+        stride, bits = self.stride, self._bits
+        head = self._body[0]
+        hr, hc = divmod(head, stride)
+        w, h = self.width, self.height
+        below = (1 << head) - 1  # Биты с меньшими индексами, чем голова
+
+        row = self._rows[hr] & bits
+        col = self._cols[hc] & bits
+        diag = self._diags[hr - hc + w - 1] & bits
+        anti = self._antis[hr + hc] & bits
+        right, down = w - 1 - hc, h - 1 - hr
+
+        # Стена: 1 / (клеток до стены + 1). Тело: 1 / k до ближайшего бита на луче - старший бит
+        # ниже головы для лучей назад по индексу (N, NE, W, NW), младший выше - для лучей вперёд
+        state = [0.0] * STATE_SIZE
+        state[0] = 1.0 / (hr + 1)
+        state[2] = 1.0 / (min(hr, right) + 1)
+        state[4] = 1.0 / (right + 1)
+        state[6] = 1.0 / (min(down, right) + 1)
+        state[8] = 1.0 / (down + 1)
+        state[10] = 1.0 / (min(down, hc) + 1)
+        state[12] = 1.0 / (hc + 1)
+        state[14] = 1.0 / (min(hr, hc) + 1)
+        for index, line, step in ((1, col, stride), (3, anti, stride - 1), (13, row, 1), (15, diag, stride + 1)):
+            behind = line & below
+            if behind:
+                state[index] = 1.0 / ((head - behind.bit_length() + 1) // step)
+        for index, line, step in ((5, row, 1), (7, diag, stride + 1), (9, col, stride), (11, anti, stride - 1)):
+            ahead = line >> (head + 1)
+            if ahead:
+                state[index] = 1.0 / ((ahead & -ahead).bit_length() // step)
+
+        fr, fc = self.food
+        state[16] = 1.0 if fr < hr else 0.0  # Еда выше
+        state[17] = 1.0 if fr > hr else 0.0  # Еда ниже
+        state[18] = 1.0 if fc < hc else 0.0  # Еда левее
+        state[19] = 1.0 if fc > hc else 0.0  # Еда правее
+        return np.array(state, dtype=np.float32)
+
+    def _is_trapped(self) -> bool:
+        """ Ни одного свободного соседа у головы (хвост к следующему шагу уйдёт) """
+        head, tail = self._body[0], self._body[-1]
+        hr, hc = divmod(head, self.stride)
+        blocked = self._bits & ~(1 << tail)
+        for ok, p in ((hr > 0, head - self.stride), (hr < self.height - 1, head + self.stride),
+                      (hc > 0, head - 1), (hc < self.width - 1, head + 1)):
+            if ok and not (blocked >> p) & 1:
+                return False
+        return True
+
+    def _count_reachable_cells(self) -> int:
+        """ Точная заливка из головы: один слой BFS за итерацию сдвигов """
+        head, tail = self._body[0], self._body[-1]
+        free = (self._board & ~self._bits) | (1 << tail)
+        start = 1 << head
+        reach = start
+        stride = self.stride
+        while True:
+            grown = reach | (free & ((reach << 1) | (reach >> 1) | (reach << stride) | (reach >> stride)))
+            if grown == reach:
+                break
+            reach = grown
+        return (reach & ~start).bit_count()
+
+    def _reachable_cells(self) -> int:
+        if self.trap_mode == "trapped":
+            return 0 if self._is_trapped() else 1
+        return self._count_reachable_cells()
+
+    # --------------------------------------------------------------------------
+    def step(self, action: int) -> Tuple[np.ndarray, float, bool]:
+        if self.done:
+            return self._get_state(), 0.0, True
+
+        # Запрет разворота в себя
+        if abs(self.direction - action) != 2:
+            self.direction = action
+
+        hr, hc = divmod(self._body[0], self.stride)
+        old_dist = abs(hr - self.food[0]) + abs(hc - self.food[1])
+        if self.direction == 0:
+            hr -= 1
+        elif self.direction == 1:
+            hc += 1
+        elif self.direction == 2:
+            hr += 1
+        elif self.direction == 3:
+            hc -= 1
+        self.steps_without_food += 1
+
+        # Условия смерти
+        max_steps = 100 + len(self._body) * 4
+        p = hr * self.stride + hc
+        if hr < 0 or hr >= self.height or hc < 0 or hc >= self.width:
+            self.death_cause = "wall"
+        elif (self._bits >> p) & 1:
+            self.death_cause = "body"
+        elif self.steps_without_food > max_steps:
+            self.death_cause = "starvation"
+        if self.death_cause is not None:
+            self.done = True
+            return self._get_state(), -20.0, True
+
+        self._body.appendleft(p)
+        self._occupy(p)
+        new_dist = abs(hr - self.food[0]) + abs(hc - self.food[1])
+
+        if (hr, hc) == self.food:
+            self.score += 1
+            self.steps_without_food = 0
+            reward = 15.0
+            if not self._free:
+                self.done = True
+                self.won = True
+                return self._get_state(), reward, True
+            self.food = self._place_food()
+        else:
+            self._release(self._body.pop())
+            reward = 0.2 if new_dist < old_dist else -0.3
+
+        if self._reachable_cells() == 0:
+            reward -= 5.0
+
+        return self._get_state(), reward, False
@@ -1,53 +1,193 @@
-import torch
-import torch.nn as nn
-import onnx
+import argparse
+import io
 import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import onnx
+import onnxruntime as ort
+import torch
+
+from snake_dqn import QNetwork, SnakeEnv
+
+# Варианты модели: fp32 - исходный экспорт, opt - офлайн-оптимизация графа ONNX Runtime,
+# fp16 - веса в половинной точности, int8 - динамическое квантование весов
+VARIANTS = ("fp32", "opt", "fp16", "int8")
+
+# Допустимое расхождение Q-значений с PyTorch относительно max |Q| по корпусу;
+# int8 заметно огрубляет Q, для него только печатается доля совпавших argmax
+TOLERANCE: Dict[str, Optional[float]] = {"fp32": 1e-5, "opt": 1e-5, "fp16": 1e-2, "int8": None}
+
+OPT_LEVELS = {
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+
+# ==============================================================================
+# ЭКСПОРТ И ВАРИАНТЫ
+# ==============================================================================
+def load_model(path: str) -> QNetwork:
+    model = QNetwork()
+    model.load_state_dict(torch.load(path, map_location="cpu"))
+    model.eval()
+    return model
+
+
+def export_fp32(model: QNetwork, path: str, opset: int = 18):
+    """ Экспорт с динамической осью батча: вход [batch, 20], выход [batch, 4], всё в одном файле """
+    buffer = io.BytesIO()
+    torch.onnx.export(
+        model,
+        torch.zeros(1, 20),
+        buffer,
+        export_params=True,
+        opset_version=opset,
+        input_names=["input"],
+        output_names=["output"],
+        dynamic_axes={"input": {0: "batch"}, "output": {0: "batch"}},
+        dynamo=False,
+    )
+    onnx_model = onnx.load_from_string(buffer.getvalue())
+    onnx.checker.check_model(onnx_model)
+    onnx.save(onnx_model, path)
+
+
+def optimize(src: str, dst: str, level: str = "basic"):
+    """
+    Офлайн-оптимизация графа: ORT сохраняет то, что построил при загрузке.
+    basic переносим (onnxruntime-web в index.html), extended/all могут
+    вставить операторы, которые есть только в нативном ORT.
+    """
+    options = ort.SessionOptions()
+    options.graph_optimization_level = OPT_LEVELS[level]
+    options.optimized_model_filepath = dst
+    ort.InferenceSession(src, options, providers=["CPUExecutionProvider"])
+
+
+def to_fp16(src: str, dst: str):
+    """ Веса и вычисления в fp16, вход и выход остаются float32 """
+    from onnxruntime.transformers.float16 import convert_float_to_float16
+
+    onnx.save(convert_float_to_float16(onnx.load(src), keep_io_types=True), dst)
+
+
+def quantize_int8(src: str, dst: str):
+    """ Динамическое квантование: веса int8 (шкала на каждый выходной нейрон), активации - на лету """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(src, dst, weight_type=QuantType.QInt8, per_channel=True)
+
+
+# ==============================================================================
+# ПРОВЕРКА: паритет с PyTorch и задержка
+# ==============================================================================
+def collect_states(model: QNetwork, count: int, seed: int = 0, epsilon: float = 0.1) -> np.ndarray:
+    """ Состояния из настоящих игр: жадная политика модели с долей случайных ходов """
+    rng = random.Random(seed)
+    env = SnakeEnv(seed=seed)
+    states: List[np.ndarray] = []
+    state = env.reset()
+    while len(states) < count:
+        states.append(state)
+        if rng.random() < epsilon:
+            action = rng.randint(0, 3)
+        else:
+            with torch.no_grad():
+                action = int(model(torch.from_numpy(state)).argmax())
+        state, _, done = env.step(action)
+        if done:
+            state = env.reset()
+    return np.stack(states)
+
+
+def session_for(path: str) -> ort.InferenceSession:
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = 1
+    return ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+def check_parity(session: ort.InferenceSession, reference: np.ndarray, states: np.ndarray) -> Dict[str, float]:
+    q = session.run(None, {session.get_inputs()[0].name: states})[0]
+    max_abs = float(np.abs(q - reference).max())
+    return {
+        "max_abs": max_abs,
+        "max_rel": max_abs / float(np.abs(reference).max()),
+        "argmax_agree": float((q.argmax(axis=1) == reference.argmax(axis=1)).mean()),
+    }
+
+
+def latency(session: ort.InferenceSession, states: np.ndarray, batch_size: int,
+            calls: int = 200, repeats: int = 3) -> float:
+    """ Лучшее из repeats среднее время одного прогона батча, с """
+    name = session.get_inputs()[0].name
+    batch = np.ascontiguousarray(np.resize(states, (batch_size, states.shape[1])))
+    session.run(None, {name: batch})
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(calls):
+            session.run(None, {name: batch})
+        best = min(best, (time.perf_counter() - start) / calls)
+    return best
+
+
+def variant_path(out: str, variant: str) -> str:
+    """ snake_model.onnx -> snake_model.int8.onnx и т.п.; fp32 пишется в сам out """
+    if variant == "fp32":
+        return out
+    root, ext = os.path.splitext(out)
+    return f"{root}.{variant}{ext or '.onnx'}"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Экспорт QNetwork в ONNX с проверкой паритета и замером задержки")
+    parser.add_argument("--model", default="snake_dqn_model.pth", help="веса PyTorch")
+    parser.add_argument("--out", default="snake_model.onnx", help="файл fp32; варианты рядом с суффиксом")
+    parser.add_argument("--variants", nargs="+", choices=VARIANTS, default=list(VARIANTS))
+    parser.add_argument("--opt-level", choices=list(OPT_LEVELS), default="basic")
+    parser.add_argument("--opset", type=int, default=18)
+    parser.add_argument("--states", type=int, default=5000, help="размер корпуса состояний для паритета")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 256])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    export_fp32(model, variant_path(args.out, "fp32"), args.opset)
+    builders = {
+        "opt": lambda dst: optimize(variant_path(args.out, "fp32"), dst, args.opt_level),
+        "fp16": lambda dst: to_fp16(variant_path(args.out, "fp32"), dst),
+        "int8": lambda dst: quantize_int8(variant_path(args.out, "fp32"), dst),
+    }
+    for variant in args.variants:
+        if variant in builders:
+            builders[variant](variant_path(args.out, variant))
+
+    states = collect_states(model, args.states, args.seed)
+    with torch.no_grad():
+        reference = model(torch.from_numpy(states)).numpy()
+
+    header = "".join(f"{f'b{b}, мкс':>12}" for b in args.batch_sizes)
+    print(f"{'вариант':<8} {'размер, КБ':>11} {'max |dQ|':>10} {'отн.':>9} {'argmax':>8}{header}  файл")
+    failed = False
+    for variant in args.variants:
+        path = variant_path(args.out, variant)
+        session = session_for(path)
+        parity = check_parity(session, reference, states)
+        tolerance = TOLERANCE[variant]
+        ok = parity["max_rel"] <= tolerance if tolerance is not None else True
+        failed |= not ok
+        timings = "".join(f"{latency(session, states, b) * 1e6:>12.1f}" for b in args.batch_sizes)
+        print(f"{variant:<8} {os.path.getsize(path) / 1024:>11.1f} {parity['max_abs']:>10.2e} {parity['max_rel']:>9.1e} "
+              f"{parity['argmax_agree'] * 100:>7.2f}%{timings}  {path}{'' if ok else '  <- ПАРИТЕТ НАРУШЕН'}")
+
+    print(f"-> Паритет проверен на {len(states)} состояниях SnakeEnv")
+    return 1 if failed else 0
+
 
-class QNetwork(nn.Module):
-    def __init__(self, input_size=20, output_size=4):
-        super(QNetwork, self).__init__()
-        self.fc = nn.Sequential(
-            nn.Linear(input_size, 256),
-            nn.ReLU(),
-            nn.Linear(256, 128),
-            nn.ReLU(),
-            nn.Linear(128, output_size)
-        )
-    def forward(self, x):
-        return self.fc(x)
-
-# 1. Загружаем веса из PyTorch
-model = QNetwork()
-model.load_state_dict(torch.load("snake_dqn_model.pth", map_location=torch.device('cpu')))
-model.eval()
-
-# 2. Создаем входной тензор
-dummy_input = torch.randn(1, 20)
-
-print("Шаг 1: Экспорт из PyTorch во временные файлы...")
-torch.onnx.export(
-    model,
-    dummy_input,
-    "temp_model.onnx",
-    export_params=True,
-    opset_version=18,
-    input_names=['input'],
-    output_names=['output']
-)
-
-print("Шаг 2: Принудительное объединение графа и весов в один файл...")
-# Загружаем модель, используя встроенную библиотеку onnx
-# Она автоматически подтянет веса из .data файла, если он создался
-onnx_model = onnx.load("temp_model.onnx")
-
-# Сохраняем обратно, но БЕЗ указания внешних форматов.
-# Функция onnx.save по умолчанию зашивает всё внутрь одного .onnx файла, если размер < 2ГБ.
-onnx.save(onnx_model, "snake_model.onnx")
-
-# Чистим за собой временные файлы
-if os.path.exists("temp_model.onnx"):
-    os.remove("temp_model.onnx")
-if os.path.exists("temp_model.onnx.data"):
-    os.remove("temp_model.onnx.data")
-
-print("Успешно! Теперь у вас есть ровно ОДИН монолитный файл: snake_model.onnx")
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+import argparse
+import ctypes
+import copy
+import random
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+import torch.optim as optim
+from torch.nn.utils import parameters_to_vector, vector_to_parameters
+
+from numpy_policy import npz_path_for, save_npz
+from replay_buffer import open_or_create
+from snake_dqn import QNetwork, SnakeEnv, dqn_update
+
+
+# ==============================================================================
+# ОБЩАЯ ПАМЯТЬ МЕЖДУ ПРОЦЕССАМИ
+# ==============================================================================
+class TransitionRing:
+    """
+    Кольцо переходов в общей памяти: один актор пишет, учитель читает.
+
+    Актор сначала записывает слот, а потом увеличивает счётчик written, поэтому
+    всё, что левее счётчика, уже готово к чтению. Переходы не сериализуются:
+    обе стороны смотрят в одни и те же массивы через NumPy.
+    """
+
+    def __init__(self, ctx, capacity: int, state_dim: int = 20):
+        self.capacity = capacity
+        self.state_dim = state_dim
+        self._raw = {
+            "states": ctx.RawArray(ctypes.c_float, capacity * state_dim),
+            "next_states": ctx.RawArray(ctypes.c_float, capacity * state_dim),
+            "actions": ctx.RawArray(ctypes.c_int64, capacity),
+            "rewards": ctx.RawArray(ctypes.c_float, capacity),
+            "dones": ctx.RawArray(ctypes.c_bool, capacity),
+        }
+        self._written = ctx.RawValue(ctypes.c_int64, 0)
+        self._attach()
+
+    def _attach(self):
+        cap, dim = self.capacity, self.state_dim
+        self.states = np.frombuffer(self._raw["states"], dtype=np.float32).reshape(cap, dim)
+        self.next_states = np.frombuffer(self._raw["next_states"], dtype=np.float32).reshape(cap, dim)
+        self.actions = np.frombuffer(self._raw["actions"], dtype=np.int64)
+        self.rewards = np.frombuffer(self._raw["rewards"], dtype=np.float32)
+        self.dones = np.frombuffer(self._raw["dones"], dtype=np.bool_)
+
+    def __getstate__(self):
+        # В дочерний процесс уходят только сами разделяемые буферы, виды NumPy строятся заново
+        return self.capacity, self.state_dim, self._raw, self._written
+
+    def __setstate__(self, state):
+        self.capacity, self.state_dim, self._raw, self._written = state
+        self._attach()
+
+    @property
+    def written(self) -> int:
+        return self._written.value
+
+    def push(self, state, action: int, reward: float, next_state, done: bool):
+        i = self._written.value % self.capacity
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        self._written.value += 1
+
+    def read(self, start: int) -> Tuple[int, Optional[Tuple[np.ndarray, ...]]]:
+        """
+        Переходы с номера start до текущего счётчика. Если актор успел уйти
+        вперёд почти на целое кольцо, самые старые переходы пропускаются, чтобы
+        не читать слоты, которые он как раз перезаписывает.
+        """
+        end = self._written.value
+        start = max(start, end - self.capacity + self.capacity // 8)
+        if start >= end:
+            return end, None
+        idx = np.arange(start, end) % self.capacity
+        return end, (self.states[idx], self.actions[idx], self.rewards[idx],
+                     self.next_states[idx], self.dones[idx])
+
+
+class SharedWeights:
+    """ Плоский вектор весов QNetwork в общей памяти с номером версии """
+
+    def __init__(self, ctx, model: QNetwork):
+        size = sum(p.numel() for p in model.parameters())
+        self._raw = ctx.RawArray(ctypes.c_float, size)
+        self._version = ctx.RawValue(ctypes.c_int64, 0)
+        self._lock = ctx.Lock()
+        self._attach()
+
+    def _attach(self):
+        self.vector = np.frombuffer(self._raw, dtype=np.float32)
+
+    def __getstate__(self):
+        return self._raw, self._version, self._lock
+
+    def __setstate__(self, state):
+        self._raw, self._version, self._lock = state
+        self._attach()
+
+    @property
+    def version(self) -> int:
+        return self._version.value
+
+    def publish(self, model: QNetwork):
+        with self._lock:
+            self.vector[:] = parameters_to_vector(model.parameters()).detach().numpy()
+            self._version.value += 1
+
+    def pull(self, model: QNetwork, seen_version: int) -> int:
+        """ Загружает веса в model, если вышла новая версия; возвращает версию у актора """
+        if self._version.value == seen_version:
+            return seen_version
+        with self._lock:
+            vector = torch.from_numpy(self.vector.copy())
+            version = self._version.value
+        vector_to_parameters(vector, model.parameters())
+        return version
+
+
+# ==============================================================================
+# АКТОР: играет своей копией SnakeEnv и шлёт переходы учителю
+# ==============================================================================
+def actor_epsilon(actor_id: int, num_actors: int, base: float = 0.4, alpha: float = 7.0) -> float:
+    """ Своя доля исследования у каждого актора (как в Ape-X): от base до почти 0 """
+    if num_actors == 1:
+        return base
+    return base ** (1 + alpha * actor_id / (num_actors - 1))
+
+
+def run_actor(actor_id: int, num_actors: int, ring: TransitionRing, weights: SharedWeights,
+              stats, stop, pull_every: int, seed: Optional[int]):
+    torch.set_num_threads(1)  # Ядра нужны другим акторам и учителю
+    actor_seed = None if seed is None else seed + actor_id
+    rng = random.Random(actor_seed)
+    env = SnakeEnv(seed=actor_seed)
+    model = QNetwork()
+    model.eval()
+    version = weights.pull(model, -1)
+    epsilon = actor_epsilon(actor_id, num_actors)
+
+    row = 3 * actor_id  # stats: шаги, эпизоды, сумма счёта
+    state = env.reset()
+    steps = 0
+    while not stop.is_set():
+        if rng.random() < epsilon:
+            action = rng.randint(0, 3)
+        else:
+            with torch.no_grad():
+                action = torch.argmax(model(torch.from_numpy(state))).item()
+
+        next_state, reward, done = env.step(action)
+        ring.push(state, action, reward, next_state, done)
+        state = next_state
+        steps += 1
+        stats[row] += 1
+
+        if done:
+            stats[row + 1] += 1
+            stats[row + 2] += env.score
+            state = env.reset()
+
+        if steps % pull_every == 0:
+            version = weights.pull(model, version)
+
+
+# ==============================================================================
+# УЧИТЕЛЬ: непрерывно обучается на переходах от всех акторов
+# ==============================================================================
+def train_distributed(num_actors: int = 4, total_updates: int = 200000, batch_size: int = 64,
+                      gamma: float = 0.98, lr: float = 0.0005, buffer_size: int = 200000,
+                      buffer_path: Optional[str] = None, ring_size: int = 8192,
+                      publish_every: int = 200, target_update_freq: int = 2000,
+                      pull_every: int = 400, report_every: float = 10.0,
+                      seed: Optional[int] = None,
+                      save_path: Optional[str] = "snake_dqn_model.pth") -> QNetwork:
+    """
+    K процессов-акторов собирают опыт, учитель в главном процессе делает
+    total_updates шагов обучения. Каждые report_every секунд печатаются
+    шаги среды/с (сумма по акторам) и обновления/с, чтобы мерить
+    масштабирование по ядрам.
+    """
+    print(f"-> Распределённое обучение: {num_actors} акторов")
+    ctx = mp.get_context("spawn")
+    if seed is not None:
+        torch.manual_seed(seed)
+
+    model = QNetwork()
+    target_model = copy.deepcopy(model)
+    target_model.eval()
+    optimizer = optim.Adam(model.parameters(), lr=lr)
+    memory = open_or_create(buffer_path, buffer_size, seed=seed)
+
+    weights = SharedWeights(ctx, model)
+    weights.publish(model)
+    rings: List[TransitionRing] = [TransitionRing(ctx, ring_size) for _ in range(num_actors)]
+    stats = ctx.RawArray(ctypes.c_int64, 3 * num_actors)
+    stop = ctx.Event()
+
+    actors = [
+        ctx.Process(target=run_actor, daemon=True,
+                    args=(k, num_actors, rings[k], weights, stats, stop, pull_every, seed))
+        for k in range(num_actors)
+    ]
+    for actor in actors:
+        actor.start()
+
+    read_pos = [0] * num_actors
+    updates = 0
+    last_time, last_updates = time.perf_counter(), 0
+    last_steps = last_episodes = last_score = 0
+
+    try:
+        while updates < total_updates:
+            for k, ring in enumerate(rings):
+                read_pos[k], chunk = ring.read(read_pos[k])
+                if chunk is not None:
+                    memory.add_batch(*chunk)
+
+            if len(memory) <= batch_size:
+                time.sleep(0.01)
+                continue
+
+            dqn_update(model, target_model, optimizer, memory.sample(batch_size), gamma)
+            updates += 1
+
+            if updates % target_update_freq == 0:
+                target_model.load_state_dict(model.state_dict())
+            if updates % publish_every == 0:
+                weights.publish(model)
+
+            now = time.perf_counter()
+            if now - last_time >= report_every:
+                totals = np.frombuffer(stats, dtype=np.int64).reshape(num_actors, 3).sum(axis=0)
+                steps, episodes, score = (int(x) for x in totals)
+                dt = now - last_time
+                new_episodes = episodes - last_episodes
+                mean_score = (score - last_score) / new_episodes if new_episodes else 0.0
+                print(f"Обновлений: {updates}/{total_updates} | "
+                      f"Шагов среды/с: {(steps - last_steps) / dt:.0f} | "
+                      f"Обновлений/с: {(updates - last_updates) / dt:.0f} | "
+                      f"Средний счёт: {mean_score:.2f}")
+                last_time, last_updates = now, updates
+                last_steps, last_episodes, last_score = steps, episodes, score
+    finally:
+        stop.set()
+        for actor in actors:
+            actor.join(timeout=5)
+            if actor.is_alive():
+                actor.terminate()
+
+    print("-> Обучение успешно завершено!")
+    memory.flush()
+    if save_path is not None:
+        torch.save(model.state_dict(), save_path)
+        save_npz(model.state_dict(), npz_path_for(save_path))
+    return model
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DQN для змейки: K акторов + учитель")
+    parser.add_argument("--actors", type=int, default=4)
+    parser.add_argument("--updates", type=int, default=200000)
+    parser.add_argument("--buffer-path", default=None)
+    parser.add_argument("--report-every", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    train_distributed(num_actors=args.actors, total_updates=args.updates, buffer_path=args.buffer_path,
+                      report_every=args.report_every, seed=args.seed)
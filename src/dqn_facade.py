@@ -1,8 +1,12 @@
+import copy
 import torch
 import torch.nn as nn
 import torch.optim as optim
 import random
 import numpy as np
+from typing import Optional
+
+from replay_buffer import ReplayBuffer
 
 
 # =====================================================================
@@ -25,20 +29,100 @@ class QNetwork(nn.Module):
 
 
 # =====================================================================
-# 2. АГЕНТ (Логика выбора действий и обучения на PyTorch)
+# 2. N-ШАГОВЫЕ ПЕРЕХОДЫ (сразу для всех копий векторной среды)
+# Из последних n шагов каждой копии собирается переход
+# (s_t, a_t, r_t + g*r_t+1 + ... + g^(n-1)*r_t+n-1, s_t+n, done).
+# =====================================================================
+class NStepAccumulator:
+    """
+    История последних n шагов каждой копии среды в массивах (num_envs, n):
+    новый шаг дописывается в последний слот, полное окно начинается с нулевого.
+
+    Когда эпизод закончился (terminated), в память уходят и все укороченные
+    окна: будущего у них нет, бутстрап не нужен. Хвост оборванного
+    (truncated) эпизода короче n шагов отбрасывается - он требовал бы
+    бутстрапа с другой степенью gamma.
+    """
+
+    def __init__(self, num_envs: int, state_dim: int, n: int, gamma: float):
+        self.num_envs = num_envs
+        self.n = n
+        self.states = np.zeros((num_envs, n, state_dim), dtype=np.float32)
+        self.actions = np.zeros((num_envs, n), dtype=np.int64)
+        self.rewards = np.zeros((num_envs, n), dtype=np.float32)
+        self.count = np.zeros(num_envs, dtype=np.int64)  # Сколько последних слотов заполнено
+        self.discounts = (gamma ** np.arange(n)).astype(np.float32)
+
+    def push(self, states, actions, rewards, next_states, terminated, truncated, mask=None):
+        """ Шаг всех копий (mask - какие из них действительно шагали); возвращает готовые переходы """
+        rows = np.arange(self.num_envs) if mask is None else np.flatnonzero(mask)
+        terminated = np.asarray(terminated, dtype=bool)
+        done = terminated | np.asarray(truncated, dtype=bool)
+
+        for hist, new in ((self.states, states), (self.actions, actions), (self.rewards, rewards)):
+            hist[rows, :-1] = hist[rows, 1:]
+            hist[rows, -1] = np.asarray(new)[rows]
+        self.count[rows] = np.minimum(self.count[rows] + 1, self.n)
+
+        parts = []
+        for j in range(self.n):  # Окно со слота j до последнего: длина n - j
+            length = self.n - j
+            ready = self.count[rows] >= length
+            if j:
+                ready &= terminated[rows]
+            take = rows[ready]
+            if len(take):
+                parts.append((self.states[take, j], self.actions[take, j],
+                              self.rewards[take, j:] @ self.discounts[:length],
+                              np.asarray(next_states, dtype=np.float32)[take], terminated[take]))
+
+        self.count[rows] = np.where(done[rows], 0, np.minimum(self.count[rows], self.n - 1))
+        if not parts:
+            return None
+        return tuple(np.concatenate(field) for field in zip(*parts))
+
+
+# =====================================================================
+# 3. АГЕНТ (Логика выбора действий и обучения на PyTorch)
 # Этот класс будет одинаковым для Змейки, Робота или Трейдинга.
 # =====================================================================
 class DQNChainAgent:
-    def __init__(self, state_dim: int, action_dim: int, lr=0.001, gamma=0.99, epsilon=0.1):
+    """
+    batch_size=None (по умолчанию) - старый режим: шаг градиентного спуска на
+    каждый переход. С batch_size (например, 64) переходы (n_step-шаговые) копятся в ReplayBuffer, и на каждые
+    update_every переходов делается шаг по минибатчу batch_size с целевой
+    сетью, которая синхронизируется раз в target_update_freq шагов обучения.
+    """
+
+    def __init__(self, state_dim: int, action_dim: int, lr=0.001, gamma=0.99, epsilon=0.1,
+                 batch_size: Optional[int] = None, buffer_size: int = 50000, update_every: int = 4,
+                 learning_starts: int = 1000, target_update_freq: int = 1000, n_step: int = 1,
+                 seed: Optional[int] = None):
+        self.state_dim = state_dim
         self.action_dim = action_dim
         self.gamma = gamma  # Коэффициент дисконтирования (наш 0.9)
         self.epsilon = epsilon  # Вероятность случайного шага
+        self.rng = np.random.default_rng(seed)
 
         # Инициализируем модель и оптимизатор
         self.model = QNetwork(state_dim, action_dim)
         self.optimizer = optim.Adam(self.model.parameters(), lr=lr)
         self.criterion = nn.MSELoss()
 
+        # Буферизованный режим
+        self.batch_size = batch_size
+        self.update_every = update_every
+        self.learning_starts = max(learning_starts, batch_size or 0)
+        self.target_update_freq = target_update_freq
+        self.n_step = n_step
+        self.updates = 0  # Сделано шагов обучения
+        self._unused = 0  # Переходов с последнего шага обучения
+        self._nstep: Optional[NStepAccumulator] = None
+        if batch_size is not None:
+            self.memory = ReplayBuffer(buffer_size, state_dim, seed=seed)
+            self.target_model = copy.deepcopy(self.model)
+            self.target_model.eval()
+
     def choose_action(self, state: np.ndarray) -> int:
         """Выбор действия: либо случайно, либо по уму нейросети"""
         if random.random() < self.epsilon:
@@ -50,8 +134,25 @@ class DQNChainAgent:
             q_values = self.model(state_t)
             return torch.argmax(q_values).item()
 
-    def learn(self, state, action, reward, next_state, done):
-        """Один шаг градиентного спуска по формуле Белмана"""
+    def choose_actions(self, states: np.ndarray) -> np.ndarray:
+        """Epsilon-жадные действия сразу для всех копий векторной среды (один прогон сети)"""
+        states_t = torch.from_numpy(np.asarray(states, dtype=np.float32))
+        with torch.no_grad():
+            greedy = self.model(states_t).argmax(1).numpy()
+        explore = self.rng.random(len(greedy)) < self.epsilon
+        return np.where(explore, self.rng.integers(0, self.action_dim, len(greedy)), greedy)
+
+    def learn(self, state, action, reward, next_state, done, truncated=False):
+        """
+        Учёт одного перехода. done - конец эпизода без будущего (terminated),
+        truncated - эпизод оборван извне (лимит времени): будущее у next_state есть.
+        """
+        if self.batch_size is not None:
+            self.learn_batch(np.asarray(state)[None], np.array([action]), np.array([reward]),
+                             np.asarray(next_state)[None], np.array([done]), np.array([truncated]))
+            return
+
+        # Старый режим: один шаг градиентного спуска по формуле Белмана
         # Превращаем всё в тензоры PyTorch
         state_t = torch.tensor(state, dtype=torch.float32)
         next_state_t = torch.tensor(next_state, dtype=torch.float32)
@@ -75,18 +176,70 @@ class DQNChainAgent:
         loss.backward()
         self.optimizer.step()
 
+    def learn_batch(self, states, actions, rewards, next_states, terminated, truncated, mask=None):
+        """
+        Шаг всех копий векторной среды: переходы в память, затем столько шагов
+        обучения, сколько набралось по update_every. mask - какие копии
+        действительно шагали (после автосброса шаг копии может быть пустым).
+        """
+        if self.batch_size is None:
+            raise ValueError("Пачки переходов учатся только через память опыта: задайте batch_size")
+        if self._nstep is None or self._nstep.num_envs != len(states):
+            self._nstep = NStepAccumulator(len(states), self.state_dim, self.n_step, self.gamma)
+
+        ready = self._nstep.push(states, actions, rewards, next_states, terminated, truncated, mask)
+        if ready is None:
+            return
+        self.memory.add_batch(*ready)
+        self._unused += len(ready[0])
+        if len(self.memory) < self.learning_starts:
+            self._unused = 0
+            return
+        while self._unused >= self.update_every:
+            self._unused -= self.update_every
+            self._update()
+
+    def _update(self):
+        """Шаг градиентного спуска по минибатчу из памяти; будущее оценивает целевая сеть"""
+        states, actions, rewards, next_states, dones = self.memory.sample(self.batch_size)
+        current_q = self.model(states).gather(1, actions.unsqueeze(1)).squeeze(1)
+        with torch.no_grad():
+            max_next_q = self.target_model(next_states).max(1)[0]
+            target_q = rewards + (1 - dones.float()) * self.gamma ** self.n_step * max_next_q
+
+        loss = self.criterion(current_q, target_q)
+        self.optimizer.zero_grad()
+        loss.backward()
+        self.optimizer.step()
+
+        self.updates += 1
+        if self.updates % self.target_update_freq == 0:
+            self.target_model.load_state_dict(self.model.state_dict())
+
 
 # =====================================================================
-# 3. ГЛОБАЛЬНЫЙ ДВИЖОК ОБУЧЕНИЯ (Главный запуск)
+# 4. ГЛОБАЛЬНЫЙ ДВИЖОК ОБУЧЕНИЯ (Главный запуск)
 # Сюда ты можешь подставить любую свою среду, и всё будет работать
 # =====================================================================
-def train_agent(env, episodes=500):
+def train_agent(env, episodes=500, **agent_kwargs):
+    """
+    env - среда в стиле Gymnasium: одиночная или векторная (num_envs копий,
+    как gymnasium.vector.SyncVectorEnv / AsyncVectorEnv). agent_kwargs
+    уходят в DQNChainAgent (batch_size, n_step, ...).
+
+    Одиночная среда по умолчанию учится по-старому, на каждом переходе;
+    память опыта включается явным batch_size. Векторной среде без памяти
+    никак, для неё batch_size по умолчанию 64.
+    """
+    if hasattr(env, "num_envs"):
+        return _train_vector(env, episodes, **agent_kwargs)
+
     # Динамически берем размеры пространств прямо из настроек среды
     state_dim = env.observation_space.shape[0]  # Сколько чисел описывают мир
     action_dim = env.action_space.n  # Сколько кнопок можно нажать
 
     # Создаем нашего универсального агента
-    agent = DQNChainAgent(state_dim, action_dim)
+    agent = DQNChainAgent(state_dim, action_dim, **agent_kwargs)
 
     for episode in range(episodes):
         state, _ = env.reset()  # Стандартный сброс среды (совместим с Gymnasium)
@@ -102,7 +255,7 @@ def train_agent(env, episodes=500):
             done = terminated or truncated  # Игра закончилась по любой причине
 
             # Агент обучается внутри своего класса через PyTorch
-            agent.learn(state, action, reward, next_state, done)
+            agent.learn(state, action, reward, next_state, terminated, truncated)
 
             state = next_state
             total_reward += reward
@@ -113,6 +266,51 @@ def train_agent(env, episodes=500):
     return agent
 
 
+def _autoreset_next_step(env) -> bool:
+    """Gymnasium >= 1.0 по умолчанию сбрасывает копию на следующем шаге, 0.29 - на том же"""
+    mode = getattr(env, "metadata", {}).get("autoreset_mode")
+    return mode is not None and getattr(mode, "value", mode) == "NextStep"
+
+
+def _train_vector(env, episodes, **agent_kwargs):
+    """Все копии среды шагают разом: один прогон сети на выбор действий и одна запись в память"""
+    agent_kwargs.setdefault("batch_size", 64)
+    agent = DQNChainAgent(env.single_observation_space.shape[0], env.single_action_space.n, **agent_kwargs)
+    next_step = _autoreset_next_step(env)
+
+    states, _ = env.reset()
+    stepped = np.ones(env.num_envs, dtype=bool)  # Какие копии на этом шаге играют, а не сбрасываются
+    returns = np.zeros(env.num_envs)
+    finished = 0
+    while finished < episodes:
+        actions = agent.choose_actions(states)
+        next_states, rewards, terminated, truncated, infos = env.step(actions)
+        done = np.asarray(terminated) | np.asarray(truncated)
+
+        # При сбросе на том же шаге next_states уже начало нового эпизода, а конец прошлого - в infos
+        final_states = next_states
+        if not next_step:
+            key = "final_obs" if "final_obs" in infos else "final_observation"
+            if key in infos:
+                final_states = np.array(next_states, copy=True)
+                for i in np.flatnonzero(infos["_" + key]):
+                    final_states[i] = infos[key][i]
+
+        agent.learn_batch(states, actions, rewards, final_states, terminated, truncated, mask=stepped)
+
+        returns += np.where(stepped, rewards, 0.0)
+        for i in np.flatnonzero(done & stepped):
+            finished += 1
+            if finished % 50 == 0:
+                print(f"Эпизод {finished} | Награда за игру: {returns[i]:.2f}")
+            returns[i] = 0.0
+
+        stepped = ~done if next_step else np.ones(env.num_envs, dtype=bool)
+        states = next_states
+
+    return agent
+
+
 class MyCustomGame:
     def __init__(self):
         # Обязательно описываем свойства, чтобы наш движок понял размеры матриц
@@ -0,0 +1,280 @@
+import argparse
+import os
+import time
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from snake_env import SnakeEnv
+from vec_snake_env import VecSnakeEnv
+
+_MAGIC = b"SNKEPS01"
+_HEADER_BYTES = 16  # magic, width u16, height u16, запас
+
+# Запись индекса: смещение записи в файле данных, число шагов и счёт эпизода
+INDEX_DTYPE = np.dtype([("offset", "<u8"), ("steps", "<u4"), ("score", "<u4")])
+
+
+# ==============================================================================
+# УПАКОВКА: varint и действия по 2 бита
+# ==============================================================================
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = int(data[pos])
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _zigzag(n: int) -> int:
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def _unzigzag(n: int) -> int:
+    return n // 2 if n % 2 == 0 else -(n + 1) // 2
+
+
+def pack_actions(actions: Sequence[int]) -> bytes:
+    """ Четыре действия (0..3) в байт, первое - в старших битах """
+    a = np.asarray(actions, dtype=np.uint8)
+    a = np.concatenate([a, np.zeros(-len(a) % 4, dtype=np.uint8)]).reshape(-1, 4)
+    return ((a[:, 0] << 6) | (a[:, 1] << 4) | (a[:, 2] << 2) | a[:, 3]).astype(np.uint8).tobytes()
+
+
+def unpack_actions(packed, steps: int) -> np.ndarray:
+    b = np.frombuffer(packed, dtype=np.uint8)
+    return np.stack([b >> 6, (b >> 4) & 3, (b >> 2) & 3, b & 3], axis=1).ravel()[:steps]
+
+
+# ==============================================================================
+# ЖУРНАЛ ЭПИЗОДОВ
+# ==============================================================================
+class EpisodeLog:
+    """
+    Эпизоды SnakeEnv как seed + действия. Эпизод - это игра SnakeEnv(width,
+    height) после reset(seed), поэтому его целиком восстанавливает повтор
+    действий: еду ставит собственный генератор среды.
+
+    Файл данных: заголовок, затем записи [varint zigzag(seed)][varint шагов]
+    [действия по 2 бита] - около четверти байта на шаг. Рядом файл path + ".idx"
+    с записью INDEX_DTYPE на эпизод. Запись только дописывается в конец, чтение
+    идёт через memory-mapped виды обоих файлов, так что журнал на миллионы
+    эпизодов не загружается в память целиком.
+
+    create=False - только существующий журнал (FileNotFoundError, если его
+    нет): так открывают для чтения, чтобы опечатка в пути не создала пустой
+    журнал. Файлы на запись открываются при первом append().
+    """
+
+    def __init__(self, path: str, width: int = 10, height: int = 10, create: bool = True):
+        self.path = path
+        self.index_path = path + ".idx"
+        if os.path.exists(path) and os.path.getsize(path) >= _HEADER_BYTES:
+            with open(path, "rb") as f:
+                header = f.read(_HEADER_BYTES)
+            if header[:8] != _MAGIC:
+                raise ValueError(f"{path} не похож на журнал эпизодов")
+            width, height = (int(x) for x in np.frombuffer(header, dtype="<u2", count=2, offset=8))
+        elif not create:
+            if os.path.exists(path):
+                raise ValueError(f"{path} не похож на журнал эпизодов")
+            raise FileNotFoundError(f"Журнал эпизодов {path} не найден")
+        else:
+            with open(path, "wb") as f:
+                f.write(_MAGIC + np.array([width, height, 0, 0], dtype="<u2").tobytes())
+            open(self.index_path, "wb").close()
+        self.width = width
+        self.height = height
+
+        self._data = None
+        self._index = None
+        self._data_view: Optional[np.memmap] = None
+        self._index_view: Optional[np.ndarray] = None
+
+    def __enter__(self) -> "EpisodeLog":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --------------------------------------------------------------------------
+    def append(self, seed: int, actions: Sequence[int], score: int):
+        if self._data is None:
+            self._data = open(self.path, "ab")
+            self._index = open(self.index_path, "ab")
+        record = bytearray()
+        _write_varint(record, _zigzag(seed))
+        _write_varint(record, len(actions))
+        record += pack_actions(actions)
+        offset = self._data.tell()
+        self._data.write(record)
+        self._index.write(np.array([(offset, len(actions), score)], dtype=INDEX_DTYPE).tobytes())
+        self._data_view = self._index_view = None  # Виды пересоздаются при следующем чтении
+
+    def flush(self):
+        if self._data is not None:
+            self._data.flush()
+            self._index.flush()
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+            self._index.close()
+            self._data = self._index = None
+        self._data_view = self._index_view = None
+
+    # --------------------------------------------------------------------------
+    def _views(self) -> Tuple[np.memmap, np.ndarray]:
+        if self._index_view is None:
+            self.flush()
+            self._data_view = np.memmap(self.path, dtype=np.uint8, mode="r")
+            if os.path.getsize(self.index_path):
+                self._index_view = np.memmap(self.index_path, dtype=INDEX_DTYPE, mode="r")
+            else:
+                self._index_view = np.zeros(0, dtype=INDEX_DTYPE)
+        return self._data_view, self._index_view
+
+    def __len__(self) -> int:
+        return len(self._views()[1])
+
+    @property
+    def index(self) -> np.ndarray:
+        """ Весь индекс (offset, steps, score) - для отбора эпизодов по счёту и длине """
+        return self._views()[1]
+
+    def episode(self, i: int) -> Tuple[int, np.ndarray]:
+        """ (seed, действия) i-го эпизода """
+        data, index = self._views()
+        seed, pos = _read_varint(data, int(index[i]["offset"]))
+        steps, pos = _read_varint(data, pos)
+        return _unzigzag(seed), unpack_actions(data[pos:pos + (steps + 3) // 4], steps)
+
+    def make_env(self, i: int) -> SnakeEnv:
+        """ Среда в начале i-го эпизода """
+        seed, _ = self.episode(i)
+        env = SnakeEnv(self.width, self.height)
+        env.reset(seed)
+        return env
+
+
+# ==============================================================================
+# ЗАПИСЬ И ВОСПРОИЗВЕДЕНИЕ
+# ==============================================================================
+def record_episodes(log: EpisodeLog, policy, seeds: Sequence[int]) -> List[int]:
+    """ Жадная игра policy (например, NumpyPolicy) по эпизоду на seed с записью в log """
+    env = SnakeEnv(log.width, log.height)
+    scores = []
+    for seed in seeds:
+        state = env.reset(seed)
+        actions = []
+        while not env.done:
+            action = policy.act(state)
+            actions.append(action)
+            state, _, _ = env.step(action)
+        log.append(seed, actions, env.score)
+        scores.append(env.score)
+    log.flush()
+    return scores
+
+
+def replay(log: EpisodeLog, i: int) -> Iterator[Tuple[SnakeEnv, np.ndarray, float, bool]]:
+    """ Пошаговое воспроизведение i-го эпизода без сети: (среда, состояние, награда, конец) """
+    env = log.make_env(i)
+    _, actions = log.episode(i)
+    for action in actions:
+        state, reward, done = env.step(int(action))
+        yield env, state, reward, done
+    if env.score != log.index[i]["score"]:
+        raise ValueError(f"Эпизод {i} воспроизвёлся со счётом {env.score} вместо {log.index[i]['score']}")
+
+
+def replay_transitions(log: EpisodeLog, episodes: Sequence[int]) -> Tuple[np.ndarray, ...]:
+    """
+    Переходы (s, a, r, s', done) сразу многих эпизодов: все они шагают одним
+    VecSnakeEnv, действие на шаге t берётся из записи. Годится для
+    ReplayBuffer.add_batch при восстановлении памяти опыта.
+    """
+    records = [log.episode(i) for i in episodes]
+    steps = np.array([len(actions) for _, actions in records])
+    table = np.zeros((len(records), int(steps.max(initial=0))), dtype=np.int64)
+    for k, (_, actions) in enumerate(records):
+        table[k, :len(actions)] = actions
+
+    env = VecSnakeEnv(len(records), log.width, log.height, seeds=[seed for seed, _ in records], auto_reset=False)
+    chunks = []
+    for t in range(table.shape[1]):
+        playing = np.flatnonzero(steps > t)
+        states = env.states[playing].copy()
+        next_states, rewards, dones = env.step(table[:, t])
+        chunks.append((states, table[playing, t], rewards[playing].astype(np.float32),
+                       next_states[playing], dones[playing]))
+    if not chunks:
+        return (np.zeros((0, 20), np.float32), np.zeros(0, np.int64), np.zeros(0, np.float32),
+                np.zeros((0, 20), np.float32), np.zeros(0, bool))
+    if not np.array_equal(env.score, log.index[list(episodes)]["score"]):
+        raise ValueError("Счёт воспроизведённых эпизодов не совпал с записанным")
+    return tuple(np.concatenate(part) for part in zip(*chunks))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Запись и воспроизведение эпизодов (seed + действия)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="сыграть модель жадно и записать эпизоды")
+    rec.add_argument("log")
+    rec.add_argument("--model", default="snake_dqn_model.pth")
+    rec.add_argument("--episodes", type=int, default=1000)
+    rec.add_argument("--seed", type=int, default=0)
+    rec.add_argument("--width", type=int, default=10)
+    rec.add_argument("--height", type=int, default=10)
+    rep = sub.add_parser("replay", help="воспроизвести все эпизоды без окна и сверить счёт")
+    rep.add_argument("log")
+    rep.add_argument("--batch", type=int, default=1024, help="эпизодов на один VecSnakeEnv")
+    reb = sub.add_parser("rebuild", help="заполнить память опыта (memory-mapped) переходами из журнала")
+    reb.add_argument("log")
+    reb.add_argument("--buffer-path", required=True)
+    reb.add_argument("--capacity", type=int, default=50000)
+    reb.add_argument("--batch", type=int, default=1024)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        from numpy_policy import NumpyPolicy
+
+        log = EpisodeLog(args.log, args.width, args.height)
+        start = time.perf_counter()
+        scores = record_episodes(log, NumpyPolicy.load(args.model), range(args.seed, args.seed + args.episodes))
+        log.close()
+        size = os.path.getsize(args.log) + os.path.getsize(log.index_path)
+        print(f"-> Записано {len(scores)} эпизодов за {time.perf_counter() - start:.1f} с, "
+              f"средний счёт {np.mean(scores):.2f}; журнал {size / 2 ** 10:.1f} КБ "
+              f"({size / max(len(scores), 1):.0f} Б на эпизод)")
+    elif args.command == "rebuild":
+        from replay_buffer import open_or_create
+
+        log = EpisodeLog(args.log, create=False)
+        memory = open_or_create(args.buffer_path, args.capacity)
+        for first in range(0, len(log), args.batch):
+            memory.add_batch(*replay_transitions(log, range(first, min(first + args.batch, len(log)))))
+        memory.flush()
+        log.close()
+        print(f"-> В {args.buffer_path} {len(memory)} переходов из {len(log)} эпизодов")
+    else:
+        log = EpisodeLog(args.log, create=False)
+        start = time.perf_counter()
+        transitions = 0
+        for first in range(0, len(log), args.batch):
+            transitions += len(replay_transitions(log, range(first, min(first + args.batch, len(log))))[0])
+        elapsed = time.perf_counter() - start
+        episodes = len(log)
+        log.close()
+        print(f"-> {episodes} эпизодов, {transitions} шагов воспроизведено за {elapsed:.2f} с "
+              f"({transitions / elapsed:.0f} шагов/с), счёт совпал")
@@ -0,0 +1,249 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from bitboard_env import BitboardSnakeEnv
+from lookahead import LookaheadPolicy
+from numpy_policy import NumpyPolicy
+from snake_env import DEATH_CAUSES, SnakeEnv
+from vec_snake_env import VecSnakeEnv
+
+# Итог эпизода: (счёт, длина в шагах, причина смерти или "won")
+Episode = Tuple[int, int, str]
+
+# Seed'ы оценки не пересекаются с seed'ами обучения, и у всех снимков они одни и те же
+EVAL_SEED = 1_000_000
+
+
+# ==============================================================================
+# ПРОГОН ЭПИЗОДОВ
+# ==============================================================================
+def run_episodes(model_path: str, seeds: Sequence[int], width: int = 10, height: int = 10,
+                 lookahead: int = 0, board: str = "grid", peek_food: bool = True) -> List[Episode]:
+    """
+    Жадная игра по эпизоду на seed; torch не нужен, поэтому годится для рабочих
+    процессов. lookahead > 0 - ход выбирается поиском LookaheadPolicy на эту
+    глубину; peek_food - знает ли поиск будущую еду (см. LookaheadPolicy).
+    board="bitboard" - BitboardSnakeEnv: на больших полях рабочий процесс не
+    строит таблицы лучей SnakeEnv (десятки МБ на 100x100).
+    """
+    if board not in ("grid", "bitboard"):
+        raise ValueError(f"Неизвестное поле '{board}', ожидается grid или bitboard")
+    if board == "bitboard" and lookahead:
+        raise ValueError("Поиск с lookahead нужен snapshot()/restore(), их есть только у SnakeEnv")
+    policy = NumpyPolicy.load(model_path)
+    planner = LookaheadPolicy(policy, lookahead, peek_food=peek_food) if lookahead else None
+    env = BitboardSnakeEnv(width, height) if board == "bitboard" else SnakeEnv(width, height)
+    episodes = []
+    for seed in seeds:
+        state = env.reset(seed)
+        length = 0
+        while not env.done:
+            action = planner.plan(env) if planner is not None else policy.act(state)
+            state, _, _ = env.step(action)
+            length += 1
+        episodes.append((env.score, length, "won" if env.won else env.death_cause))
+    return episodes
+
+
+def run_episodes_batched(policy: NumpyPolicy, seeds: Sequence[int],
+                         width: int = 10, height: int = 10) -> List[Episode]:
+    """ Все эпизоды разом в одном процессе: VecSnakeEnv + один прогон сети на шаг """
+    env = VecSnakeEnv(len(seeds), width, height, seeds=list(seeds), auto_reset=False)
+    lengths = np.zeros(len(seeds), dtype=np.int64)
+    while not env.done.all():
+        lengths += ~env.done
+        env.step(policy(env.states).argmax(axis=1))
+    return [(int(env.score[i]), int(lengths[i]),
+             "won" if env.won[i] else DEATH_CAUSES[env.death_cause[i]]) for i in range(len(seeds))]
+
+
+def summarize(episodes: Sequence[Episode]) -> Dict[str, object]:
+    scores = np.array([e[0] for e in episodes], dtype=np.float64)
+    lengths = np.array([e[1] for e in episodes], dtype=np.float64)
+    causes = [e[2] for e in episodes]
+    p10, p25, p50, p75, p90 = np.percentile(scores, [10, 25, 50, 75, 90])
+    return {
+        "episodes": len(episodes),
+        "score_mean": float(scores.mean()),
+        "score_std": float(scores.std()),
+        "score_min": int(scores.min()),
+        "score_p10": float(p10),
+        "score_p25": float(p25),
+        "score_median": float(p50),
+        "score_p75": float(p75),
+        "score_p90": float(p90),
+        "score_max": int(scores.max()),
+        "length_mean": float(lengths.mean()),
+        "length_median": float(np.median(lengths)),
+        "wins": causes.count("won"),
+        "deaths": {cause: causes.count(cause) for cause in DEATH_CAUSES},
+    }
+
+
+def format_summary(summary: Dict[str, object]) -> str:
+    deaths = ", ".join(f"{cause}: {count}" for cause, count in summary["deaths"].items())
+    line = (f"Счёт: {summary['score_mean']:.2f} ± {summary['score_std']:.2f} | "
+            f"медиана {summary['score_median']:.0f}, p10 {summary['score_p10']:.0f}, "
+            f"p90 {summary['score_p90']:.0f}, max {summary['score_max']} | "
+            f"длина {summary['length_mean']:.0f} | побед {summary['wins']} | смерти: {deaths}")
+    if summary.get("lookahead"):
+        line += f" | поиск на {summary['lookahead']}"
+        if summary["peek_food"]:
+            line += " (будущая еда известна)"
+    return line
+
+
+def _chunks(seeds: Sequence[int], parts: int) -> List[List[int]]:
+    return [list(seeds[k::parts]) for k in range(parts) if seeds[k::parts]]
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    # spawn, как в distributed_train: одинаково на всех ОС и без копии состояния родителя
+    return ProcessPoolExecutor(workers, mp_context=mp.get_context("spawn"))
+
+
+def evaluate(model_path: str, episodes: int = 200, seed: int = EVAL_SEED, width: int = 10, height: int = 10,
+             workers: Optional[int] = None, batched: bool = False, lookahead: int = 0,
+             board: str = "grid", peek_food: bool = True) -> Dict[str, object]:
+    """
+    Жадная оценка чекпоинта (.pth или .npz) на episodes эпизодах с seed'ами
+    seed, seed + 1, ...: пулом процессов (workers, по умолчанию по числу ядер)
+    или batched - пакетом в одном процессе. lookahead - глубина поиска
+    LookaheadPolicy поверх сети (только пулом), board и peek_food - как в
+    run_episodes. С поиском в итогах есть "lookahead" и "peek_food": при
+    peek_food=True поиск знает, где появится еда, и счёт завышен относительно
+    честной игры.
+    """
+    seeds = list(range(seed, seed + episodes))
+    if batched and lookahead:
+        raise ValueError("Поиск с lookahead идёт по отдельным SnakeEnv, пакетный режим для него не подходит")
+    if batched and board != "grid":
+        raise ValueError("Пакетный режим играет на VecSnakeEnv, board для него только grid")
+    if batched:
+        return summarize(run_episodes_batched(NumpyPolicy.load(model_path), seeds, width, height))
+
+    NumpyPolicy.load(model_path)  # .npz создаётся здесь один раз, а не в каждом процессе
+    workers = workers or os.cpu_count() or 1
+    with _pool(workers) as pool:
+        parts = [pool.submit(run_episodes, model_path, chunk, width, height, lookahead, board, peek_food)
+                 for chunk in _chunks(seeds, workers)]
+        summary = summarize([e for part in parts for e in part.result()])
+    if lookahead:
+        summary.update(lookahead=lookahead, peek_food=peek_food)
+    return summary
+
+
+# ==============================================================================
+# ФОНОВАЯ ОЦЕНКА СНИМКОВ ВО ВРЕМЯ ОБУЧЕНИЯ
+# ==============================================================================
+class AsyncEvaluator:
+    """
+    Очередь оценок снимков .npz в пуле процессов. submit() и poll() не ждут
+    рабочих, так что цикл обучения не останавливается; готовые итоги poll()
+    возвращает (и дописывает в log_path, если задан). Все снимки играются на
+    одних и тех же seed'ах, поэтому их итоги сравнимы между собой.
+
+    Упавшая оценка (битый снимок, гибель рабочего процесса) не роняет обучение:
+    она печатается, пишется в log_path с полем "error" и копится в errors.
+
+    board - среда рабочих процессов, как в run_episodes (при обучении на
+    BitboardSnakeEnv оценка идёт на ней же).
+    """
+
+    def __init__(self, workers: int = 2, episodes: int = 200, seed: int = EVAL_SEED,
+                 width: int = 10, height: int = 10, log_path: Optional[str] = None, board: str = "grid"):
+        self.workers = workers
+        self.seeds = list(range(seed, seed + episodes))
+        self.width = width
+        self.height = height
+        self.board = board
+        self.log_path = log_path
+        self._pool = _pool(workers)
+        # По записи на вызов submit (одинаковые теги не склеиваются)
+        self._pending: List[Tuple[str, List[Future]]] = []
+        self.errors: List[Tuple[str, str]] = []
+
+    def submit(self, tag: str, model_path: str):
+        try:
+            parts = self._submit(model_path)
+        except BrokenProcessPool:
+            # Рабочий процесс погиб, пул больше не принимает задачи: заводим новый
+            self._pool.shutdown(wait=False)
+            self._pool = _pool(self.workers)
+            parts = self._submit(model_path)
+        self._pending.append((tag, parts))
+
+    def _submit(self, model_path: str) -> List[Future]:
+        return [self._pool.submit(run_episodes, model_path, chunk, self.width, self.height, 0, self.board)
+                for chunk in _chunks(self.seeds, self.workers)]
+
+    def poll(self) -> List[Tuple[str, Dict[str, object]]]:
+        finished, records, pending = [], [], []
+        for tag, parts in self._pending:
+            if not all(part.done() for part in parts):
+                pending.append((tag, parts))
+                continue
+            try:
+                summary = summarize([e for part in parts for e in part.result()])
+            except (Exception, CancelledError) as exc:
+                error = f"{type(exc).__name__}: {exc}"
+                print(f"-> Оценка {tag} не удалась: {error}")
+                self.errors.append((tag, error))
+                records.append({"time": time.time(), "tag": tag, "error": error})
+                continue
+            finished.append((tag, summary))
+            records.append({"time": time.time(), "tag": tag, **summary})
+        self._pending = pending
+
+        if self.log_path is not None and records:
+            with open(self.log_path, "a") as f:
+                for record in records:
+                    f.write(json.dumps(record) + "\n")
+        return finished
+
+    def close(self, wait: bool = True) -> List[Tuple[str, Dict[str, object]]]:
+        """ Дождаться оставшихся оценок (wait=False - отменить их) и закрыть пул """
+        if not wait:
+            for _, parts in self._pending:
+                for part in parts:
+                    part.cancel()
+            self._pending = []
+        self._pool.shutdown(wait=True)
+        return self.poll()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Жадная оценка чекпоинтов на множестве эпизодов")
+    parser.add_argument("models", nargs="*", default=["snake_dqn_model.pth"], help=".pth или .npz")
+    parser.add_argument("--episodes", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=EVAL_SEED)
+    parser.add_argument("--width", type=int, default=10)
+    parser.add_argument("--height", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=None, help="процессов в пуле (по умолчанию по числу ядер)")
+    parser.add_argument("--batched", action="store_true", help="пакетом в одном процессе вместо пула")
+    parser.add_argument("--lookahead", type=int, default=0, help="глубина поиска поверх сети (0 - жадно)")
+    parser.add_argument("--board", choices=["grid", "bitboard"], default="grid",
+                        help="bitboard - BitboardSnakeEnv для больших полей")
+    parser.add_argument("--no-peek-food", action="store_true",
+                        help="поиск не знает, где появится еда (по умолчанию знает, как игра)")
+    parser.add_argument("--json", default=None, help="записать итоги в JSON")
+    args = parser.parse_args()
+
+    report = {}
+    for model in args.models:
+        start = time.perf_counter()
+        report[model] = evaluate(model, args.episodes, args.seed, args.width, args.height,
+                                 args.workers, args.batched, args.lookahead, args.board,
+                                 not args.no_peek_food)
+        print(f"{model} ({time.perf_counter() - start:.1f} с): {format_summary(report[model])}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,88 @@
+import random
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from snake_env import SnakeEnv
+
+# Узел дерева: по ребру на действие - (действие, награда, конец, поддерево или номер листа)
+Node = List[Tuple[int, float, bool, Union["Node", int, None]]]
+
+
+# ==============================================================================
+# ПОИСК НА ГЛУБИНУ С ОЦЕНКОЙ ЛИСТЬЕВ СЕТЬЮ
+# ==============================================================================
+class LookaheadPolicy:
+    """
+    Перебор всех последовательностей из depth ходов через snapshot()/restore()
+    копии среды; лист оценивается как max Q сети (одним батчем на весь перебор),
+    ход выбирается по r + gamma * V. Разворот в себя равносилен ходу прямо,
+    поэтому из каждой позиции ветвей три, а не четыре.
+
+    Копия живёт внутри политики, игровая среда не трогается. По умолчанию
+    будущая еда известна поиску точно: у копии тот же генератор, что и у игры,
+    так что оценка с поиском не сравнима с жадной один к одному. peek_food=False
+    даёт копии собственный генератор - еда в переборе ставится наугад.
+
+    Совместима с NumpyPolicy по act(state), если привязана к среде (env=...);
+    state при этом не нужен - план строится по env.
+    """
+
+    def __init__(self, evaluator, depth: int = 2, gamma: float = 0.98, env: Optional[SnakeEnv] = None,
+                 peek_food: bool = True):
+        if depth < 1:
+            raise ValueError(f"Глубина поиска должна быть не меньше 1, получено {depth}")
+        self.evaluator = evaluator  # NumpyPolicy, TorchBackend и т.п.: (B, 20) -> (B, 4)
+        self.depth = depth
+        self.gamma = gamma
+        self.env = env
+        self.peek_food = peek_food
+        self._food_rng = random.Random(0)
+        self.nodes = 0  # Шагов среды, сделанных поиском (для замеров узлов в секунду)
+        self._scratch: Optional[SnakeEnv] = None
+
+    def act(self, state: Optional[np.ndarray] = None) -> int:
+        return self.plan(self.env)
+
+    def plan(self, env: SnakeEnv) -> int:
+        scratch = self._scratch
+        if scratch is None or (scratch.width, scratch.height) != (env.width, env.height):
+            scratch = self._scratch = SnakeEnv(env.width, env.height)
+        root = env.snapshot()
+        if not self.peek_food:
+            # Последнее поле снимка - состояние генератора еды (snake_env.Snapshot)
+            root = root[:-1] + (self._food_rng.getstate(),)
+            self._food_rng.random()
+        scratch.restore(root)
+        leaves: List[np.ndarray] = []
+        tree = self._expand(scratch, root, self.depth, leaves)
+        values = self.evaluator(np.stack(leaves)).max(axis=1) if leaves else np.zeros(0)
+        best = max(tree, key=lambda edge: self._edge_value(edge, values))
+        return best[0]
+
+    def _expand(self, env: SnakeEnv, snap, depth: int, leaves: List[np.ndarray]) -> Node:
+        """ env уже стоит в snap: первую ветвь можно играть без restore() """
+        node: Node = []
+        actions = [a for a in range(4) if abs(env.direction - a) != 2]
+        for k, action in enumerate(actions):
+            if k:
+                env.restore(snap)
+            state, reward, done = env.step(action)
+            self.nodes += 1
+            if done:
+                child = None
+            elif depth == 1:
+                child = len(leaves)
+                leaves.append(state)
+            else:
+                child = self._expand(env, env.snapshot(), depth - 1, leaves)
+            node.append((action, reward, done, child))
+        return node
+
+    def _edge_value(self, edge, values: np.ndarray) -> float:
+        _, reward, done, child = edge
+        if done:
+            return reward
+        if isinstance(child, int):
+            return reward + self.gamma * float(values[child])
+        return reward + self.gamma * max(self._edge_value(e, values) for e in child)
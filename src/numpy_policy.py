@@ -0,0 +1,97 @@
+import argparse
+import os
+import warnings
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+# ==============================================================================
+# ИНФЕРЕНС QNetwork НА NUMPY (без torch)
+# ==============================================================================
+def save_npz(state_dict, npz_path: str) -> str:
+    """ state_dict QNetwork (тензоры или массивы) -> .npz с теми же именами """
+    np.savez(npz_path, **{name: np.asarray(tensor.detach().cpu() if hasattr(tensor, "detach") else tensor)
+                          for name, tensor in state_dict.items()})
+    return npz_path
+
+
+def convert_pth(pth_path: str, npz_path: str) -> str:
+    """ Разовая конвертация .pth в .npz; единственное место, где нужен torch """
+    import torch
+
+    return save_npz(torch.load(pth_path, map_location="cpu"), npz_path)
+
+
+def npz_path_for(path: str) -> str:
+    return os.path.splitext(path)[0] + ".npz"
+
+
+def _npz_for(path: str) -> str:
+    """
+    Путь к весам .npz. Для .pth берётся соседний .npz (train_dqn пишет его
+    вместе с .pth); если его нет или .pth новее (веса заменили в обход
+    train_dqn) - он создаётся из .pth заново. Без torch устаревший .npz
+    остаётся в ходу с предупреждением: на свежем клоне времена файлов
+    задаёт checkout, а не обучение.
+    """
+    if path.endswith(".npz"):
+        return path
+    npz_path = npz_path_for(path)
+    exists = os.path.exists(npz_path)
+    if not exists or (os.path.exists(path) and os.path.getmtime(path) > os.path.getmtime(npz_path)):
+        try:
+            convert_pth(path, npz_path)
+        except ImportError:
+            if not exists:
+                raise
+            warnings.warn(f"{path} новее {npz_path}, но без torch его не сконвертировать: берётся {npz_path}")
+    return npz_path
+
+
+class NumpyPolicy:
+    """
+    Прямой проход MLP QNetwork (Linear-ReLU-...-Linear) матричными умножениями
+    NumPy. Совместим с бэкендами policy_server: (B, 20) float32 -> (B, 4).
+    """
+
+    def __init__(self, weights: Dict[str, np.ndarray]):
+        # Слои fc.0, fc.2, fc.4 - Linear; веса хранятся уже транспонированными под x @ W
+        names = sorted({name.rsplit(".", 1)[0] for name in weights}, key=lambda n: int(n.rsplit(".", 1)[1]))
+        self.layers: List[Tuple[np.ndarray, np.ndarray]] = [
+            (np.ascontiguousarray(weights[f"{n}.weight"].T, dtype=np.float32),
+             np.asarray(weights[f"{n}.bias"], dtype=np.float32))
+            for n in names
+        ]
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyPolicy":
+        """ Из .npz или из snake_dqn_model.pth (через разовую конвертацию в соседний .npz) """
+        with np.load(_npz_for(path)) as data:
+            return cls({name: data[name] for name in data.files})
+
+    def __call__(self, states: np.ndarray) -> np.ndarray:
+        x = states
+        last = len(self.layers) - 1
+        for i, (weight, bias) in enumerate(self.layers):
+            x = x @ weight + bias
+            if i != last:
+                np.maximum(x, 0.0, out=x)
+        return x
+
+    def act(self, state: np.ndarray) -> int:
+        """ Жадное действие для одного состояния (20,) """
+        return int(self(state).argmax())
+
+    def act_batch(self, states: np.ndarray) -> np.ndarray:
+        return self(states).argmax(axis=1)
+
+
+if __name__ == "__main__":
+    # Сам load() пересоздаёт .npz, если его нет или .pth новее; вручную - чтобы
+    # сконвертировать заранее (например, перед запуском там, где нет torch) или в --out
+    parser = argparse.ArgumentParser(description="Конвертация весов QNetwork из .pth в .npz")
+    parser.add_argument("--model", default="snake_dqn_model.pth")
+    parser.add_argument("--out", default=None, help="по умолчанию рядом с .pth")
+    args = parser.parse_args()
+    print(f"-> Веса сохранены в {convert_pth(args.model, args.out or npz_path_for(args.model))}")
@@ -0,0 +1,231 @@
+import argparse
+import asyncio
+import time
+from collections import Counter, deque
+from typing import Callable, Deque, Dict, List, Optional
+
+import numpy as np
+
+from numpy_policy import NumpyPolicy
+from snake_env import SnakeEnv
+
+
+# ==============================================================================
+# БЭКЕНДЫ ИНФЕРЕНСА: (B, 20) float32 -> (B, 4) Q-значения
+# (NumpyPolicy из numpy_policy - такой же бэкенд, но без torch)
+# ==============================================================================
+class TorchBackend:
+    def __init__(self, model_path: str):
+        import torch
+        from snake_dqn import QNetwork
+
+        self._torch = torch
+        self.model = QNetwork()
+        self.model.load_state_dict(torch.load(model_path, map_location="cpu"))
+        self.model.eval()
+
+    def __call__(self, states: np.ndarray) -> np.ndarray:
+        with self._torch.no_grad():
+            return self.model(self._torch.from_numpy(states)).numpy()
+
+
+class OnnxBackend:
+    def __init__(self, onnx_path: str):
+        import onnxruntime as ort
+
+        self.session = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Модель, экспортированная с фиксированным [1, 20], пакетом не прогнать
+        self.fixed_batch = model_input.shape[0] == 1
+
+    def __call__(self, states: np.ndarray) -> np.ndarray:
+        if self.fixed_batch:
+            return np.concatenate([self.session.run(None, {self.input_name: s[None]})[0] for s in states])
+        return self.session.run(None, {self.input_name: states})[0]
+
+
+# ==============================================================================
+# СЕРВЕР: склеивает запросы многих игр в один батч
+# ==============================================================================
+class PolicyServer:
+    """
+    Игры вызывают await server.act(state) и получают действие. Запросы копятся в
+    очереди: батч уходит в сеть, как только набралось max_batch_size состояний
+    или с первого запроса в батче прошло max_wait_ms. Один прогон сети на батч
+    вместо прогона на каждое состояние.
+
+    Ошибка бэкенда (или состояние не той формы) достаётся всем запросам своего
+    батча, сервер продолжает работать. После stop() ждущие запросы получают
+    RuntimeError, а не висят вечно.
+
+    Перцентили задержки считаются по последним latency_window запросам, так
+    что память сервера не растёт со временем работы; reset_stats() начинает
+    статистику заново.
+    """
+
+    def __init__(self, backend: Callable[[np.ndarray], np.ndarray],
+                 max_batch_size: int = 64, max_wait_ms: float = 2.0, latency_window: int = 100_000):
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.latencies: Deque[float] = deque(maxlen=latency_window)
+        self.requests = 0
+        self.batch_sizes: Counter = Counter()
+
+    def reset_stats(self):
+        self.latencies.clear()
+        self.requests = 0
+        self.batch_sizes.clear()
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._serve())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._queue is not None:
+            pending = []
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+            self._fail(pending, RuntimeError("PolicyServer остановлен"))
+            self._queue = None
+
+    async def act(self, state: np.ndarray) -> int:
+        if self._task is None:
+            raise RuntimeError("PolicyServer не запущен: сначала await server.start()")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((state, future, time.perf_counter()))
+        return await future
+
+    @staticmethod
+    def _fail(batch, exc: BaseException):
+        for _, future, _ in batch:
+            if not future.done():
+                future.set_exception(exc)
+
+    async def _serve(self):
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    if not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                self._run_batch(batch)
+                batch = []
+        except asyncio.CancelledError:
+            # Запросы, уже вынутые из очереди, stop() не увидит
+            self._fail(batch, RuntimeError("PolicyServer остановлен"))
+            raise
+
+    def _run_batch(self, batch):
+        try:
+            states = np.stack([item[0] for item in batch])
+            actions = self.backend(states).argmax(axis=1)
+        except Exception as exc:
+            self._fail(batch, exc)
+            return
+
+        now = time.perf_counter()
+        self.batch_sizes[len(batch)] += 1
+        self.requests += len(batch)
+        for (_, future, enqueued), action in zip(batch, actions):
+            self.latencies.append(now - enqueued)
+            if not future.done():
+                future.set_result(int(action))
+
+    def stats(self) -> Dict[str, float]:
+        latencies = np.array(self.latencies) * 1000.0
+        batches = sum(self.batch_sizes.values())
+        return {
+            "requests": self.requests,
+            "batches": batches,
+            "mean_batch": self.requests / batches if batches else 0.0,
+            "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+        }
+
+    def batch_histogram(self) -> Dict[str, int]:
+        """ Число батчей по корзинам размера 1, 2-3, 4-7, ... """
+        histogram: Dict[str, int] = {}
+        for size, count in sorted(self.batch_sizes.items()):
+            low = 1 << (size.bit_length() - 1)
+            key = f"{low}-{2 * low - 1}" if low > 1 else "1"
+            histogram[key] = histogram.get(key, 0) + count
+        return histogram
+
+
+# ==============================================================================
+# НАГРУЗКА: N безголовых игр SnakeEnv, которые ходят через сервер
+# ==============================================================================
+async def play_session(server: PolicyServer, env: SnakeEnv, episodes: int) -> List[int]:
+    scores = []
+    for _ in range(episodes):
+        state = env.reset()
+        while not env.done:
+            action = await server.act(state)
+            state, _, _ = env.step(action)
+        scores.append(env.score)
+    return scores
+
+
+async def run_load(backend: Callable[[np.ndarray], np.ndarray], sessions: int, episodes: int,
+                   max_batch_size: int, max_wait_ms: float, seed: int = 0) -> PolicyServer:
+    server = PolicyServer(backend, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    await server.start()
+    start = time.perf_counter()
+    try:
+        results = await asyncio.gather(*[
+            play_session(server, SnakeEnv(seed=seed + i), episodes) for i in range(sessions)
+        ])
+    finally:
+        await server.stop()
+    elapsed = time.perf_counter() - start
+
+    scores = [s for session in results for s in session]
+    stats = server.stats()
+    print(f"Сессий: {sessions} | Решений: {stats['requests']} за {elapsed:.2f} с "
+          f"({stats['requests'] / elapsed:.0f}/с) | Средний счёт: {np.mean(scores):.2f}")
+    print(f"Задержка p50: {stats['p50_ms']:.2f} мс | p99: {stats['p99_ms']:.2f} мс | "
+          f"Средний батч: {stats['mean_batch']:.1f}")
+    print("Размеры батчей:", ", ".join(f"{k}: {v}" for k, v in server.batch_histogram().items()))
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пакетный сервер политики для многих игр")
+    parser.add_argument("--backend", choices=["numpy", "torch", "onnx"], default="numpy")
+    parser.add_argument("--model", default=None, help="путь к .pth/.npz или .onnx")
+    parser.add_argument("--sessions", type=int, default=256)
+    parser.add_argument("--episodes", type=int, default=2)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    if args.backend == "numpy":
+        policy = NumpyPolicy.load(args.model or "snake_dqn_model.pth")
+    elif args.backend == "torch":
+        policy = TorchBackend(args.model or "snake_dqn_model.pth")
+    else:
+        policy = OnnxBackend(args.model or "../snake_model.onnx")
+    asyncio.run(run_load(policy, args.sessions, args.episodes, args.max_batch, args.max_wait_ms))
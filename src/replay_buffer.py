@@ -0,0 +1,272 @@
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+import torch
+
+_MAGIC = 0x534E414B45524231  # "SNAKERB1"
+_HEADER_WORDS = 8  # magic, capacity, state_dim, cursor, size + запас
+
+
+# ==============================================================================
+# ПАМЯТЬ ОПЫТА НА ПРЕДВЫДЕЛЕННЫХ МАССИВАХ (кольцевой буфер)
+# ==============================================================================
+class ReplayBuffer:
+    """
+    Кольцевой буфер переходов (s, a, r, s', done) в непрерывных массивах NumPy.
+
+    Запись идёт по курсору поверх самых старых переходов. Минибатч собирается
+    одной выборкой по индексам на каждое поле, а в тензоры превращается через
+    torch.from_numpy без копирования.
+
+    Если задан path, массивы живут в memory-mapped файле: буфер на миллионы
+    переходов не обязан помещаться в RAM, а после flush() его можно открыть
+    через ReplayBuffer.open(path) и продолжить обучение без повторного сбора.
+    """
+
+    def __init__(self, capacity: int, state_dim: int = 20, path: Optional[str] = None,
+                 seed: Optional[int] = None):
+        self.capacity = capacity
+        self.state_dim = state_dim
+        self.path = path
+        self.cursor = 0
+        self.size = 0
+        self.rng = np.random.default_rng(seed)
+
+        if path is None:
+            self._header = None
+            self.states = np.zeros((capacity, state_dim), dtype=np.float32)
+            self.next_states = np.zeros((capacity, state_dim), dtype=np.float32)
+            self.actions = np.zeros(capacity, dtype=np.int64)
+            self.rewards = np.zeros(capacity, dtype=np.float32)
+            self.dones = np.zeros(capacity, dtype=bool)
+        else:
+            self._map(path, "w+")
+            self._header[:5] = (_MAGIC, capacity, state_dim, 0, 0)
+
+    @classmethod
+    def open(cls, path: str, seed: Optional[int] = None) -> "ReplayBuffer":
+        """ Восстанавливает буфер из файла, сохранённого через flush() """
+        header = np.fromfile(path, dtype=np.int64, count=_HEADER_WORDS)
+        if len(header) < _HEADER_WORDS or header[0] != _MAGIC:
+            raise ValueError(f"{path} не похож на файл ReplayBuffer")
+
+        buffer = cls.__new__(cls)
+        buffer.capacity = int(header[1])
+        buffer.state_dim = int(header[2])
+        buffer.path = path
+        buffer.rng = np.random.default_rng(seed)
+        buffer._map(path, "r+")
+        buffer.cursor = int(header[3])
+        buffer.size = int(header[4])
+        return buffer
+
+    def _map(self, path: str, mode: str):
+        """ Раскладывает заголовок и поля подряд в одном файле """
+        cap, dim = self.capacity, self.state_dim
+        layout = [
+            ("_header", np.int64, (_HEADER_WORDS,)),
+            ("states", np.float32, (cap, dim)),
+            ("next_states", np.float32, (cap, dim)),
+            ("actions", np.int64, (cap,)),
+            ("rewards", np.float32, (cap,)),
+            ("dones", np.bool_, (cap,)),
+        ]
+        offset = 0
+        for name, dtype, shape in layout:
+            array = np.memmap(path, dtype=dtype, mode=mode, offset=offset, shape=shape)
+            setattr(self, name, array)
+            offset += array.nbytes
+            mode = "r+"  # Файл уже создан первым полем, остальные дописываются в него
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        """ Сколько байт занимают данные буфера (в RAM или в файле) """
+        return (self.states.nbytes + self.next_states.nbytes + self.actions.nbytes +
+                self.rewards.nbytes + self.dones.nbytes)
+
+    def add(self, state, action: int, reward: float, next_state, done: bool):
+        i = self.cursor
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        self.cursor = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def add_batch(self, states: np.ndarray, actions: np.ndarray, rewards: np.ndarray,
+                  next_states: np.ndarray, dones: np.ndarray):
+        """ Пачка переходов (например, от VecSnakeEnv.step) одной записью на поле """
+        n = len(states)
+        idx = (self.cursor + np.arange(n)) % self.capacity
+        self.states[idx] = states
+        self.actions[idx] = actions
+        self.rewards[idx] = rewards
+        self.next_states[idx] = next_states
+        self.dones[idx] = dones
+        self.cursor = int((self.cursor + n) % self.capacity)
+        self.size = min(self.size + n, self.capacity)
+
+    def sample_indices(self, batch_size: int) -> np.ndarray:
+        return self.rng.integers(0, self.size, size=batch_size)
+
+    def gather(self, idx: np.ndarray) -> Tuple[torch.Tensor, ...]:
+        """ (states, actions, rewards, next_states, dones) для индексов idx """
+        return (
+            torch.from_numpy(self.states[idx]),
+            torch.from_numpy(self.actions[idx]),
+            torch.from_numpy(self.rewards[idx]),
+            torch.from_numpy(self.next_states[idx]),
+            torch.from_numpy(self.dones[idx]),
+        )
+
+    def sample(self, batch_size: int) -> Tuple[torch.Tensor, ...]:
+        return self.gather(self.sample_indices(batch_size))
+
+    def flush(self):
+        """ Сохраняет курсор и данные на диск (только для буфера в файле) """
+        if self._header is None:
+            return
+        self._header[3] = self.cursor
+        self._header[4] = self.size
+        for array in (self._header, self.states, self.next_states, self.actions, self.rewards, self.dones):
+            array.flush()
+
+
+# ==============================================================================
+# ПРИОРИТЕТНАЯ ПАМЯТЬ ОПЫТА (sum-tree)
+# ==============================================================================
+class SumTree:
+    """
+    Дерево сумм в одном массиве: лист i лежит в tree[leaves + i], узел k хранит
+    сумму своих детей 2k и 2k + 1, корень - tree[1]. Обновление и поиск пачкой
+    индексов идут по уровням векторно, то есть за O(log n) операций NumPy.
+    """
+
+    def __init__(self, capacity: int):
+        self.leaves = 1 << max(0, (capacity - 1).bit_length())
+        self.depth = self.leaves.bit_length() - 1
+        self.tree = np.zeros(2 * self.leaves, dtype=np.float64)
+
+    @property
+    def total(self) -> float:
+        return float(self.tree[1])
+
+    def get(self, idx: np.ndarray) -> np.ndarray:
+        return self.tree[self.leaves + idx]
+
+    def set(self, i: int, priority: float):
+        """ Одиночное обновление простым подъёмом к корню - дешевле векторного для одного листа """
+        tree = self.tree
+        node = self.leaves + i
+        tree[node] = priority
+        node //= 2
+        while node:
+            tree[node] = tree[2 * node] + tree[2 * node + 1]
+            node //= 2
+
+    def update(self, idx: np.ndarray, priorities: np.ndarray):
+        nodes = self.leaves + np.asarray(idx)
+        self.tree[nodes] = priorities
+        for _ in range(self.depth):
+            # Повторы родителей не страшны: все они запишут одну и ту же сумму
+            nodes = nodes // 2
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def find(self, values: np.ndarray) -> np.ndarray:
+        """ Для каждого value в [0, total) - лист, в чей отрезок префиксных сумм он попал """
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = self.tree[2 * nodes]
+            go_right = values >= left
+            values -= np.where(go_right, left, 0.0)
+            nodes = 2 * nodes + go_right
+        return nodes - self.leaves
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """
+    Пропорциональная приоритетная выборка (PER): переход берётся с вероятностью
+    p_i^alpha / sum(p^alpha), где p_i = |TD-ошибка| + eps. Смещение выборки
+    компенсируется весами importance sampling (N * P(i))^-beta, нормированными
+    на максимум в батче. Новые переходы получают максимальный приоритет, чтобы
+    каждый попал в обучение хотя бы раз.
+    """
+
+    def __init__(self, capacity: int, state_dim: int = 20, path: Optional[str] = None,
+                 seed: Optional[int] = None, alpha: float = 0.6, eps: float = 1e-3):
+        super().__init__(capacity, state_dim, path=path, seed=seed)
+        self._init_priorities(alpha, eps)
+
+    @classmethod
+    def open(cls, path: str, seed: Optional[int] = None, alpha: float = 0.6,
+             eps: float = 1e-3) -> "PrioritizedReplayBuffer":
+        """ Приоритеты в файл не пишутся: восстановленные переходы получают равный приоритет """
+        buffer = super().open(path, seed)
+        buffer._init_priorities(alpha, eps)
+        buffer.tree.update(np.arange(buffer.size), np.ones(buffer.size))
+        return buffer
+
+    def _init_priorities(self, alpha: float, eps: float):
+        self.alpha = alpha
+        self.eps = eps
+        self.max_priority = 1.0
+        self.tree = SumTree(self.capacity)
+
+    @property
+    def nbytes(self) -> int:
+        return super().nbytes + self.tree.tree.nbytes
+
+    def add(self, state, action: int, reward: float, next_state, done: bool):
+        i = self.cursor
+        super().add(state, action, reward, next_state, done)
+        self.tree.set(i, self.max_priority ** self.alpha)
+
+    def add_batch(self, states: np.ndarray, actions: np.ndarray, rewards: np.ndarray,
+                  next_states: np.ndarray, dones: np.ndarray):
+        idx = (self.cursor + np.arange(len(states))) % self.capacity
+        super().add_batch(states, actions, rewards, next_states, dones)
+        self.tree.update(idx, np.full(len(idx), self.max_priority ** self.alpha))
+
+    def sample_indices(self, batch_size: int) -> np.ndarray:
+        # Стратифицированно: по одной точке в каждом из batch_size равных отрезков суммы
+        segment = self.tree.total / batch_size
+        values = (np.arange(batch_size) + self.rng.random(batch_size)) * segment
+        # Защита от погрешности float: пустые листья за концом буфера не выбираем
+        return np.minimum(self.tree.find(values), self.size - 1)
+
+    def weights(self, idx: np.ndarray, beta: float) -> torch.Tensor:
+        probs = self.tree.get(idx) / self.tree.total
+        weights = (self.size * probs) ** -beta
+        return torch.from_numpy((weights / weights.max()).astype(np.float32))
+
+    def sample_prioritized(self, batch_size: int, beta: float) -> Tuple[Tuple[torch.Tensor, ...], np.ndarray, torch.Tensor]:
+        """ (батч как в sample, индексы для update_priorities, веса importance sampling) """
+        idx = self.sample_indices(batch_size)
+        return self.gather(idx), idx, self.weights(idx, beta)
+
+    def update_priorities(self, idx: np.ndarray, td_errors: np.ndarray):
+        priorities = np.abs(td_errors) + self.eps
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        # При повторе индекса в батче остаётся последний приоритет, этого достаточно
+        self.tree.update(idx, priorities ** self.alpha)
+
+
+def open_or_create(path: Optional[str], capacity: int, state_dim: int = 20,
+                   prioritized: bool = False, alpha: float = 0.6, seed: Optional[int] = None) -> ReplayBuffer:
+    """ Буфер в памяти, новый файл или продолжение сохранённого файла; seed - генератор выборки """
+    if path is not None and os.path.exists(path):
+        if prioritized:
+            buffer = PrioritizedReplayBuffer.open(path, seed, alpha=alpha)
+        else:
+            buffer = ReplayBuffer.open(path, seed)
+        print(f"-> Память опыта восстановлена из {path}: {len(buffer)} переходов")
+        return buffer
+    if prioritized:
+        return PrioritizedReplayBuffer(capacity, state_dim, path=path, seed=seed, alpha=alpha)
+    return ReplayBuffer(capacity, state_dim, path=path, seed=seed)
@@ -0,0 +1,214 @@
+import random
+from array import array
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+import numpy as np
+
+from state_encoder import StateEncoder
+from trap_detection import TrapDetector
+
+# Причины проигрыша (SnakeEnv.death_cause); у выигранного или идущего эпизода - None
+DEATH_CAUSES = ("wall", "body", "starvation")
+
+# Снимок SnakeEnv.snapshot(): (клетки, длина, еда, направление, счёт, шаги без еды,
+# done, won, причина смерти, состояние генератора)
+Snapshot = Tuple[bytes, int, Tuple[int, int], int, int, int, bool, bool, Optional[str], tuple]
+
+
+# ==============================================================================
+# СРЕДА ИГРЫ (8 направлений, разделение стены/тела)
+# ==============================================================================
+class SnakeEnv:
+    def __init__(self, width: int = 10, height: int = 10, seed: Optional[int] = None,
+                 trap_mode: str = "trapped", trap_cap: Optional[int] = None):
+        self.width = width
+        self.height = height
+        # Для штрафа важно лишь, заперта ли змейка, поэтому по умолчанию самый дешёвый режим
+        self.trap = TrapDetector(width, height, mode=trap_mode, cap=trap_cap)
+        self.encoder = StateEncoder(width, height)
+        # Сетка занятости (r * width + c) со служебными клетками кодировщика.
+        # Буфер один на всё время жизни среды, NumPy смотрит в него без копий
+        self._grid = self.encoder.new_grid()
+        self._grid_view = np.frombuffer(self._grid, dtype=np.uint8)
+        # Индекс свободных клеток: массив _free и позиция каждой клетки в нём (-1 - занята).
+        # Удаление обменом с последним, поэтому еда ставится за O(1) при любой заполненности
+        self._free: List[int] = []
+        self._free_pos: List[int] = [-1] * (width * height)
+        # Собственный генератор, чтобы эпизоды воспроизводились по seed
+        self.rng = random.Random(seed)
+        self._cell_type = "H" if width * height <= 1 << 16 else "I"
+        # Состояние генератора для snapshot(): getstate() дорогой, а генератор сдвигается только при
+        # постановке еды, поэтому состояние кэшируется до следующего _place_food
+        self._rng_state: Optional[tuple] = None
+        self.reset()
+
+    def reset(self, seed: Optional[int] = None) -> np.ndarray:
+        """
+        Новый эпизод. С seed генератор заводится заново (как в Gymnasium):
+        эпизод reset(seed) один и тот же при любой истории среды и совпадает
+        с первым эпизодом SnakeEnv(seed=seed). Без seed генератор идёт дальше.
+        """
+        if seed is not None:
+            self.rng.seed(seed)
+            self._rng_state = None
+        # Спавним змейку так, чтобы сзади было место
+        self.snake: Deque[Tuple[int, int]] = deque([
+            (self.height // 2, self.width // 2),
+            (self.height // 2, self.width // 2 + 1),
+            (self.height // 2, self.width // 2 + 2)
+        ])
+        self._rebuild_board()
+        self.direction = 3  # 0=ВВЕРХ, 1=ВПРАВО, 2=ВНИЗ, 3=ВЛЕВО
+        self.score = 0
+        self.done = False
+        self.won = False  # Змейка заняла всё поле
+        self.death_cause: Optional[str] = None
+        self.food: Tuple[int, int] = self._place_food()
+        self.steps_without_food = 0
+        return self._get_state()
+
+    def _rebuild_board(self):
+        """ Сетка занятости и индекс свободных клеток заново по self.snake (от головы к хвосту) """
+        cells = self.width * self.height
+        self._grid[:cells] = bytes(cells)
+        self._free = list(range(cells))
+        self._free_pos = list(range(cells))
+        for r, c in self.snake:
+            self._occupy(r * self.width + c)
+
+    def _occupy(self, pos: int):
+        self._grid[pos] = 1
+        i = self._free_pos[pos]
+        last = self._free.pop()
+        if last != pos:
+            self._free[i] = last
+            self._free_pos[last] = i
+        self._free_pos[pos] = -1
+
+    def _release(self, pos: int):
+        self._grid[pos] = 0
+        self._free_pos[pos] = len(self._free)
+        self._free.append(pos)
+
+    def _place_food(self) -> Tuple[int, int]:
+        """ Случайная свободная клетка за O(1); вызывается, только пока свободные клетки есть """
+        self._rng_state = None
+        return divmod(self._free[self.rng.randrange(len(self._free))], self.width)
+
+    def _count_reachable_cells(self) -> int:
+        """ Точное число клеток, достижимых из головы (хвост может уйти, его не считаем блоком) """
+        if not self.snake: return 0
+        return self.trap.count(self._grid, self._flat(self.snake[0]), self._flat(self.snake[-1]))
+
+    def _reachable_cells(self) -> int:
+        """ Достижимые клетки в режиме self.trap: 0 означает глухой капкан """
+        return self.trap.reachable(self._grid, self._flat(self.snake[0]), self._flat(self.snake[-1]))
+
+    def snapshot(self) -> Snapshot:
+        """
+        Полное состояние игры для ветвления поиска. Тело (от головы) и индекс
+        свободных клеток вместе покрывают поле ровно один раз, поэтому хранятся
+        одним упакованным массивом из width * height клеток. Порядок индекса и
+        состояние генератора сохраняются как есть: после restore() еда встанет
+        туда же, куда встала бы в исходной игре.
+        """
+        w = self.width
+        cells = array(self._cell_type, [r * w + c for r, c in self.snake])
+        cells.extend(self._free)
+        if self._rng_state is None:
+            self._rng_state = self.rng.getstate()
+        return (cells.tobytes(), len(self.snake), self.food, self.direction, self.score,
+                self.steps_without_food, self.done, self.won, self.death_cause, self._rng_state)
+
+    def restore(self, snap: Snapshot):
+        (packed, length, self.food, self.direction, self.score, self.steps_without_food,
+         self.done, self.won, self.death_cause, rng_state) = snap
+        cells = array(self._cell_type)
+        cells.frombytes(packed)
+        w, grid = self.width, self._grid
+        grid[:len(cells)] = bytes(len(cells))
+        body = cells[:length]
+        for pos in body:
+            grid[pos] = 1
+        self.snake = deque(divmod(pos, w) for pos in body)
+        self._free = cells[length:].tolist()
+        free_pos = [-1] * len(cells)
+        for i, pos in enumerate(self._free):
+            free_pos[pos] = i
+        self._free_pos = free_pos
+        if rng_state is not self._rng_state:
+            self.rng.setstate(rng_state)
+            self._rng_state = rng_state
+
+    def _flat(self, cell: Tuple[int, int]) -> int:
+        return cell[0] * self.width + cell[1]
+
+    def _get_state(self) -> np.ndarray:
+        """ 8 лучей * (близость стены, близость тела) + 4 признака еды = 20 признаков """
+        state = self.encoder.encode(self._grid_view, self._flat(self.snake[0]), self._flat(self.food))
+        return state.copy()  # Буфер кодировщика общий, а состояния копятся в памяти обучения
+
+    def step(self, action: int) -> Tuple[np.ndarray, float, bool]:
+        if self.done:
+            return self._get_state(), 0.0, True
+
+        # Запрет разворота в себя
+        if abs(self.direction - action) != 2:
+            self.direction = action
+
+        hr, hc = self.snake[0]
+        if self.direction == 0:
+            hr -= 1
+        elif self.direction == 1:
+            hc += 1
+        elif self.direction == 2:
+            hr += 1
+        elif self.direction == 3:
+            hc -= 1
+
+        new_head = (hr, hc)
+        self.steps_without_food += 1
+
+        # Считаем расстояние до еды ДО шага
+        old_dist = abs(self.snake[0][0] - self.food[0]) + abs(self.snake[0][1] - self.food[1])
+
+        # Условия смерти
+        max_steps = 100 + len(self.snake) * 4  # Увеличим лимит для больших размеров
+        if hr < 0 or hr >= self.height or hc < 0 or hc >= self.width:
+            self.death_cause = "wall"
+        elif self._grid[hr * self.width + hc]:
+            self.death_cause = "body"
+        elif self.steps_without_food > max_steps:
+            self.death_cause = "starvation"
+        if self.death_cause is not None:
+            self.done = True
+            return self._get_state(), -20.0, True  # Штраф умеренный, чтобы не забивать другие Q-значения
+
+        self.snake.appendleft(new_head)
+        self._occupy(hr * self.width + hc)
+
+        # Считаем расстояние ПОСЛЕ шага
+        new_dist = abs(new_head[0] - self.food[0]) + abs(new_head[1] - self.food[1])
+
+        if new_head == self.food:
+            self.score += 1
+            self.steps_without_food = 0
+            reward = 15.0  # Стимул расти
+            if not self._free:
+                # Еду ставить некуда: поле заполнено, это победа
+                self.done = True
+                self.won = True
+                return self._get_state(), reward, True
+            self.food = self._place_food()
+        else:
+            tr, tc = self.snake.pop()
+            self._release(tr * self.width + tc)
+            # Бонус за приближение к еде, штраф за удаление
+            reward = 0.2 if new_dist < old_dist else -0.3
+
+        # Проверка на тупик (стоимость зависит от режима self.trap)
+        if self._reachable_cells() == 0:
+            reward -= 5.0  # Штраф за попадание в глухой капкан
+
+        return self._get_state(), reward, False
@@ -0,0 +1,216 @@
+import argparse
+import time
+import tkinter as tk
+from collections import deque
+from typing import Deque, Optional, Sequence, Tuple
+
+from episode_log import EpisodeLog
+from lookahead import LookaheadPolicy
+from numpy_policy import NumpyPolicy
+from snake_env import SnakeEnv
+
+HEAD_COLOR = "#db7b04"
+BODY_COLOR = "#00AA44"
+BG_COLOR = "#1e1e1e"
+SIM_SLICE = 0.01  # Сколько секунд подряд симуляция может занимать цикл событий Tk
+
+
+# ==============================================================================
+# ВИЗУАЛИЗАЦИЯ ОБУЧЕННОЙ МОДЕЛИ
+# ==============================================================================
+class SnakeVisualizer:
+    """
+    С model_path змейкой управляет модель (lookahead > 0 - через поиск
+    LookaheadPolicy на эту глубину). С actions воспроизводится запись эпизода
+    env.reset(seed) (см. from_log), а первые start_step шагов проматываются
+    без отрисовки.
+
+    Симуляция и отрисовка - два независимых цикла after(): игра идёт со
+    скоростью steps_per_sec (None - без ограничения), а кадр рисуется не чаще
+    fps раз в секунду. Элементы холста живут всё время игры: за кадр голова
+    и хвост переезжают через coords(), новые клетки создаются только при росте.
+    """
+
+    def __init__(self, env: SnakeEnv, model_path: Optional[str] = None, cell_size: int = 35,
+                 actions: Optional[Sequence[int]] = None, start_step: int = 0, lookahead: int = 0,
+                 steps_per_sec: Optional[float] = 20.0, fps: float = 30.0, seed: Optional[int] = None):
+        self.env = env
+        self.cell_size = cell_size
+        self.steps_per_sec = steps_per_sec
+        self.fps = fps
+
+        # Для показа хватает NumPy: torch не импортируется (.pth один раз конвертируется в .npz)
+        self.policy = NumpyPolicy.load(model_path) if actions is None else None
+        if self.policy is not None and lookahead:
+            self.policy = LookaheadPolicy(self.policy, lookahead, env=env)
+        self._actions = iter(actions) if actions is not None else None
+
+        self.root = tk.Tk()
+        self.root.title("Финальный результат DQN модели")
+
+        self.info_label = tk.Label(self.root, text="Анализ поля...", font=("Arial", 14))
+        self.info_label.pack()
+
+        self.canvas = tk.Canvas(
+            self.root,
+            width=self.env.width * self.cell_size,
+            height=self.env.height * self.cell_size,
+            bg=BG_COLOR
+        )
+        self.canvas.pack()
+
+        self.state = self.env.reset(seed)
+        if self._actions is not None:
+            for _ in range(start_step):
+                action = next(self._actions, None)
+                if action is None or self.env.done:
+                    break
+                self.state, _, _ = self.env.step(int(action))
+
+        self.steps = 0  # Шагов симуляции с начала показа
+        self.finished: Optional[str] = None  # Итоговая надпись, когда показ окончен
+        self._drawn_steps = 0
+        self._drawn: Deque[Tuple[int, int]] = deque()  # Клетки змейки на холсте, от головы
+        self._items: Deque[int] = deque()  # Прямоугольники этих клеток в том же порядке
+        self._food_item = self.canvas.create_oval(0, 0, 0, 0, fill="#FF5555", outline="")
+        self._drawn_food: Optional[Tuple[int, int]] = None
+
+        self._sim_start = time.perf_counter()
+        self.draw()
+        self.simulate()
+        self.render()
+
+    @classmethod
+    def from_log(cls, log_path: str, episode: int, start_step: int = 0, cell_size: int = 35,
+                 steps_per_sec: Optional[float] = 20.0, fps: float = 30.0) -> "SnakeVisualizer":
+        """ Воспроизведение эпизода из журнала EpisodeLog """
+        with EpisodeLog(log_path, create=False) as log:
+            seed, actions = log.episode(episode)
+            width, height = log.width, log.height
+        return cls(SnakeEnv(width, height), cell_size=cell_size, actions=actions, start_step=start_step,
+                   steps_per_sec=steps_per_sec, fps=fps, seed=seed)
+
+    # --------------------------------------------------------------------------
+    # ОТРИСОВКА
+    # --------------------------------------------------------------------------
+    def _cell_box(self, cell: Tuple[int, int]) -> Tuple[int, int, int, int]:
+        r, c = cell
+        return c * self.cell_size, r * self.cell_size, (c + 1) * self.cell_size, (r + 1) * self.cell_size
+
+    def _new_cell(self, cell: Tuple[int, int]) -> int:
+        return self.canvas.create_rectangle(*self._cell_box(cell), fill=BODY_COLOR, outline=BG_COLOR)
+
+    def draw(self):
+        """
+        Приводит холст к текущему состоянию env. Если с прошлого кадра прошло
+        меньше шагов, чем длина змейки, старая змейка - хвост новой: ушедшие
+        клетки хвоста переезжают в новые клетки головы, при росте добавляются
+        новые. Иначе (большая промотка) все клетки перекладываются заново.
+        """
+        snake = self.env.snake
+        moved = self.steps - self._drawn_steps
+        if self._items:
+            self.canvas.itemconfigure(self._items[0], fill=BODY_COLOR)
+
+        if 0 < moved < len(snake) and len(self._drawn) + moved >= len(snake) and snake[moved] == self._drawn[0]:
+            spare = len(self._drawn) + moved - len(snake)  # Столько клеток хвоста ушло
+            for i in range(moved - 1, -1, -1):  # Новые клетки головы, от старой головы к новой
+                cell = snake[i]
+                if spare:
+                    item = self._items.pop()
+                    self._drawn.pop()
+                    self.canvas.coords(item, *self._cell_box(cell))
+                    spare -= 1
+                else:
+                    item = self._new_cell(cell)
+                self._items.appendleft(item)
+                self._drawn.appendleft(cell)
+        elif moved or not self._items:
+            while len(self._items) > len(snake):
+                self.canvas.delete(self._items.pop())
+            while len(self._items) < len(snake):
+                self._items.append(self._new_cell(snake[0]))
+            for item, cell in zip(self._items, snake):
+                self.canvas.coords(item, *self._cell_box(cell))
+            self._drawn = deque(snake)
+
+        if self._items:
+            self.canvas.itemconfigure(self._items[0], fill=HEAD_COLOR)
+        if self.env.food != self._drawn_food:
+            x0, y0, x1, y1 = self._cell_box(self.env.food)
+            self.canvas.coords(self._food_item, x0 + 4, y0 + 4, x1 - 4, y1 - 4)
+            self._drawn_food = self.env.food
+        self._drawn_steps = self.steps
+        self.info_label.config(text=self.finished or f"Счёт: {self.env.score}")
+
+    def render(self):
+        """ Цикл кадров: рисует, только если симуляция ушла вперёд, и не чаще fps """
+        if self.steps != self._drawn_steps or self.finished:
+            self.draw()
+        if not self.finished:
+            self.root.after(max(1, int(1000 / self.fps)), self.render)
+
+    # --------------------------------------------------------------------------
+    # СИМУЛЯЦИЯ
+    # --------------------------------------------------------------------------
+    def step(self) -> bool:
+        """ Один ход игры; False, когда показ окончен """
+        if self.env.done:
+            self.finished = f"Game over! Score: {self.env.score}"
+            return False
+
+        if self._actions is None:
+            action = self.policy.act(self.state)
+        else:
+            action = next(self._actions, None)
+            if action is None:
+                self.finished = f"Запись закончилась. Счёт: {self.env.score}"
+                return False
+        self.state, _, _ = self.env.step(int(action))
+        self.steps += 1
+        return True
+
+    def simulate(self):
+        """
+        Цикл симуляции: ходы, которые положены к этому моменту по
+        steps_per_sec (или сколько успеется без ограничения), но не дольше
+        SIM_SLICE подряд, чтобы окно успевало рисовать и отвечать.
+        """
+        deadline = time.perf_counter() + SIM_SLICE
+        while True:
+            now = time.perf_counter()
+            if self.steps_per_sec and self.steps >= (now - self._sim_start) * self.steps_per_sec:
+                break
+            if not self.step():
+                return
+            if now >= deadline:
+                break
+        delay = int(1000 / self.steps_per_sec) if self.steps_per_sec else 1
+        self.root.after(max(1, delay), self.simulate)
+
+    def start(self):
+        self.root.mainloop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Игра модели или воспроизведение записанного эпизода")
+    parser.add_argument("--model", default="snake_dqn_model.pth")
+    parser.add_argument("--lookahead", type=int, default=0, help="глубина поиска поверх сети (0 - жадно)")
+    parser.add_argument("--replay", default=None, help="журнал EpisodeLog")
+    parser.add_argument("--episode", type=int, default=0)
+    parser.add_argument("--from-step", type=int, default=0, help="промотать столько шагов без отрисовки")
+    parser.add_argument("--width", type=int, default=10)
+    parser.add_argument("--height", type=int, default=10)
+    parser.add_argument("--cell-size", type=int, default=35)
+    parser.add_argument("--sps", type=float, default=20.0, help="шагов игры в секунду (0 - без ограничения)")
+    parser.add_argument("--fps", type=float, default=30.0, help="предел кадров в секунду")
+    args = parser.parse_args()
+
+    if args.replay:
+        visualizer = SnakeVisualizer.from_log(args.replay, args.episode, args.from_step, args.cell_size,
+                                              args.sps or None, args.fps)
+    else:
+        visualizer = SnakeVisualizer(SnakeEnv(width=args.width, height=args.height), model_path=args.model,
+                                     cell_size=args.cell_size, lookahead=args.lookahead,
+                                     steps_per_sec=args.sps or None, fps=args.fps)
+    visualizer.start()
@@ -0,0 +1,104 @@
+from typing import Optional
+
+import numpy as np
+
+# 8 направлений лучей в порядке признаков: N, NE, E, SE, S, SW, W, NW
+RAY_DIRECTIONS = [
+    (-1, 0), (-1, 1), (0, 1), (1, 1),
+    (1, 0), (1, -1), (0, -1), (-1, -1)
+]
+
+STATE_SIZE = 20  # 8 * (стена, тело) + 4 признака еды
+
+
+# ==============================================================================
+# КОДИРОВЩИК СОСТОЯНИЯ (20 признаков на предвычисленных таблицах лучей)
+# ==============================================================================
+class StateEncoder:
+    """
+    Строит 20 признаков SnakeEnv._get_state для поля width x height.
+
+    Всё, что зависит только от позиции головы, считается один раз в конструкторе:
+    близость стены по каждому лучу и списки клеток луча (плоские индексы
+    r * width + c). Сетка занятости длиннее поля на две служебные клетки:
+    free_cell (всегда 0) добивает короткие лучи, а stop_cell (всегда 1) стоит
+    в конце каждого луча. Тогда argmax по лучу всегда находит "попадание", и
+    близость тела берётся одной выборкой из inv_dist, где для stop_cell лежит 0.
+    Такую сетку создаёт new_grid().
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.cells = width * height
+        self.ray_len = max(width, height) - 1
+        self.free_cell = self.cells
+        self.stop_cell = self.cells + 1
+        self.grid_size = self.cells + 2
+
+        self.rays = np.full((self.cells, 8, self.ray_len + 1), self.free_cell, dtype=np.int64)
+        self.rays[:, :, -1] = self.stop_cell
+        wall = np.zeros((self.cells, 8), dtype=np.float64)
+        for hr in range(height):
+            for hc in range(width):
+                pos = hr * width + hc
+                for d, (dr, dc) in enumerate(RAY_DIRECTIONS):
+                    r, c = hr + dr, hc + dc
+                    k = 0
+                    while 0 <= r < height and 0 <= c < width:
+                        self.rays[pos, d, k] = r * width + c
+                        r += dr
+                        c += dc
+                        k += 1
+                    wall[pos, d] = 1.0 / (k + 1)  # Близость к стене
+        self.wall = wall.astype(np.float32)
+        # Близость к телу при первом попадании на шаге k + 1 (считаем в float64, как
+        # было в SnakeEnv); последний элемент - попадание в stop_cell, то есть тела нет
+        inv_dist = 1.0 / np.arange(1, self.ray_len + 2, dtype=np.float64)
+        inv_dist[-1] = 0.0
+        self.inv_dist = inv_dist.astype(np.float32)
+
+        self.buffer = np.zeros(STATE_SIZE, dtype=np.float32)
+
+    def new_grid(self) -> bytearray:
+        """ Пустая сетка занятости со служебными клетками """
+        grid = bytearray(self.grid_size)
+        grid[self.stop_cell] = 1
+        return grid
+
+    def encode(self, grid: np.ndarray, head: int, food: int,
+               out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Состояние одной игры. grid - NumPy-вид сетки из new_grid().
+        Без out пишет в общий self.buffer: он перезаписывается следующим вызовом.
+        """
+        if out is None:
+            out = self.buffer
+
+        first = grid[self.rays[head]].argmax(axis=1)  # Первое попадание на каждом луче
+        out[0:16:2] = self.wall[head]
+        out[1:16:2] = self.inv_dist[first]
+
+        hr, hc = divmod(head, self.width)
+        fr, fc = divmod(food, self.width)
+        # Еда выше, ниже, левее, правее
+        out[16:] = (fr < hr, fr > hr, fc < hc, fc > hc)
+        return out
+
+    def encode_batch(self, grid: np.ndarray, rows: np.ndarray, heads: np.ndarray,
+                     foods: np.ndarray, out: np.ndarray) -> np.ndarray:
+        """ Пакетный вариант: grid (n, grid_size), пишет состояния игр rows в out[rows] """
+        if len(rows) == 0:
+            return out
+
+        first = grid[rows[:, None, None], self.rays[heads]].argmax(axis=2)  # (k, 8)
+        out[rows, 0:16:2] = self.wall[heads]
+        out[rows, 1:16:2] = self.inv_dist[first]
+
+        hr, hc = heads // self.width, heads % self.width
+        fr, fc = foods // self.width, foods % self.width
+        out[rows, 16] = fr < hr
+        out[rows, 17] = fr > hr
+        out[rows, 18] = fc < hc
+        out[rows, 19] = fc > hc
+        return out
@@ -0,0 +1,235 @@
+import cProfile
+import csv
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from typing import Dict, Optional
+
+_NULL_PHASE = nullcontext()
+
+# Фазы train_dqn; колонки для них есть в каждой строке метрик, даже если фаза ещё не началась
+PHASES = ("act", "env_step", "state_encode", "trap_check", "buffer_add",
+          "sample", "forward", "backward", "priority_update", "target_sync")
+
+
+# ==============================================================================
+# ТАЙМЕРЫ ФАЗ
+# ==============================================================================
+class _Phase:
+    __slots__ = ("totals", "counts", "name", "start")
+
+    def __init__(self, totals: Dict[str, float], counts: Dict[str, int], name: str):
+        self.totals = totals
+        self.counts = counts
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.totals[self.name] += time.perf_counter() - self.start
+        self.counts[self.name] += 1
+
+
+class PhaseTimer:
+    """
+    Накопительные таймеры фаз обучения: with timer.phase("forward"): ...
+
+    Выключенный таймер на каждую фазу отдаёт один и тот же nullcontext, так что
+    цена инструментирования без профилирования - один вызов метода.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.totals: Dict[str, float] = Counter()
+        self.counts: Dict[str, int] = Counter()
+        self._phases: Dict[str, _Phase] = {}
+
+    def phase(self, name: str):
+        if not self.enabled:
+            return _NULL_PHASE
+        phase = self._phases.get(name)
+        if phase is None:
+            phase = self._phases[name] = _Phase(self.totals, self.counts, name)
+        return phase
+
+    def wrap(self, obj, method: str, name: str):
+        """ Замеряет метод объекта (например, env._get_state), не трогая его класс """
+        if not self.enabled:
+            return
+        original = getattr(obj, method)
+        phase = self.phase(name)
+
+        def timed(*args, **kwargs):
+            with phase:
+                return original(*args, **kwargs)
+
+        setattr(obj, method, timed)
+
+    def reset(self):
+        self.totals.clear()
+        self.counts.clear()
+
+
+# ==============================================================================
+# СЧЁТЧИКИ И ЗАПИСЬ МЕТРИК
+# ==============================================================================
+class MetricsLogger:
+    """
+    Счётчики обучения за окно между записями и запись строки в файл:
+    .jsonl - по JSON-объекту на строку, .csv - таблица (счётчики и все фазы PHASES).
+    Без path ничего не считается и не пишется.
+    """
+
+    def __init__(self, path: Optional[str] = None, timer: Optional[PhaseTimer] = None):
+        self.path = path
+        self.enabled = path is not None
+        self.timer = timer or PhaseTimer(enabled=False)
+        self.total_steps = 0
+        self.total_updates = 0
+        self.total_episodes = 0
+        self._file = None
+        self._csv = None
+        self._window_start = time.perf_counter()
+        self._reset_window()
+
+        if self.enabled:
+            self._file = open(path, "a", newline="")
+
+    def _reset_window(self):
+        self.steps = 0
+        self.updates = 0
+        self.episodes = 0
+        self.score_sum = 0
+        self.score_max = 0
+        self.loss_sum = 0.0
+
+    def log_step(self):
+        self.steps += 1
+
+    def log_update(self, loss: float):
+        self.updates += 1
+        self.loss_sum += loss
+
+    def log_episode(self, score: int):
+        self.episodes += 1
+        self.score_sum += score
+        self.score_max = max(self.score_max, score)
+
+    def flush(self, epoch: int, epsilon: float):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        elapsed = now - self._window_start
+        self.total_steps += self.steps
+        self.total_updates += self.updates
+        self.total_episodes += self.episodes
+
+        row = {
+            "time": time.time(),
+            "epoch": epoch,
+            "epsilon": epsilon,
+            "steps": self.total_steps,
+            "updates": self.total_updates,
+            "episodes": self.total_episodes,
+            "steps_per_sec": self.steps / elapsed if elapsed else 0.0,
+            "updates_per_sec": self.updates / elapsed if elapsed else 0.0,
+            "mean_score": self.score_sum / self.episodes if self.episodes else 0.0,
+            "max_score": self.score_max,
+            "mean_loss": self.loss_sum / self.updates if self.updates else 0.0,
+        }
+        # Время фаз за окно, мс (вложенные фазы входят и в объемлющую: state/trap внутри env_step)
+        for name in PHASES + tuple(sorted(set(self.timer.totals) - set(PHASES))):
+            row[f"ms_{name}"] = self.timer.totals.get(name, 0.0) * 1000.0
+
+        if self.path.endswith(".csv"):
+            if self._csv is None:
+                self._csv = csv.DictWriter(self._file, fieldnames=list(row), extrasaction="ignore")
+                if self._file.tell() == 0:
+                    self._csv.writeheader()
+            self._csv.writerow(row)
+        else:
+            self._file.write(json.dumps(row) + "\n")
+        self._file.flush()
+
+        self.timer.reset()
+        self._reset_window()
+        self._window_start = now
+
+    def close(self, epoch: Optional[int] = None, epsilon: float = 0.0):
+        """ С epoch неполное последнее окно (конец не кратен metrics_every, досрочный стоп) тоже пишется """
+        if epoch is not None and (self.steps or self.episodes):
+            self.flush(epoch, epsilon)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# ==============================================================================
+# ПРОФИЛИРОВЩИКИ
+# ==============================================================================
+class SamplingProfiler:
+    """ Раз в interval секунд снимает стек главного потока и считает, где он чаще всего """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                code = frame.f_code
+                self.samples[f"{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_name}"] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, top: int = 20):
+        self._stop.set()
+        self._thread.join()
+        total = sum(self.samples.values()) or 1
+        print(f"-> Сэмплирующий профиль ({total} снимков):")
+        for place, count in self.samples.most_common(top):
+            print(f"{count / total * 100:6.1f}%  {place}")
+
+
+class RunProfiler:
+    """
+    Профилирование всего запуска без правки кода: mode "cprofile" или "sampling"
+    (берётся из аргумента или переменной окружения SNAKE_PROFILE).
+    """
+
+    def __init__(self, mode: Optional[str] = None, output: str = "train_profile.prof"):
+        self.mode = mode or os.environ.get("SNAKE_PROFILE") or None
+        if self.mode not in (None, "cprofile", "sampling"):
+            raise ValueError(f"Неизвестный профилировщик '{self.mode}': ожидается cprofile или sampling")
+        self.output = output
+        self._profiler = None
+
+    def __enter__(self):
+        if self.mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.mode == "sampling":
+            self._profiler = SamplingProfiler()
+            self._profiler.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.mode == "cprofile":
+            self._profiler.disable()
+            self._profiler.dump_stats(self.output)
+            print(f"-> Профиль cProfile сохранён в {self.output}")
+            pstats.Stats(self._profiler).sort_stats("cumulative").print_stats(20)
+        elif self.mode == "sampling":
+            self._profiler.stop()
@@ -0,0 +1,81 @@
+from typing import List, Optional, Tuple
+
+# Режимы проверки тупика:
+#   "count"   - точное число достижимых из головы клеток (полный обход)
+#   "trapped" - только ответ "заперта или нет" (0 или 1), выход на первой свободной клетке
+#   "capped"  - число достижимых клеток, но не больше cap (обход останавливается на cap)
+TRAP_MODES = ("count", "trapped", "capped")
+
+
+# ==============================================================================
+# ДВИЖОК ПРОВЕРКИ ТУПИКОВ
+# ==============================================================================
+class TrapDetector:
+    """
+    Считает клетки, достижимые из головы змейки, для поля width x height.
+
+    Поле передаётся сеткой занятости bytearray (индекс r * width + c), голова и
+    хвост - плоскими индексами. Хвост не считается препятствием: к следующему
+    шагу он уйдёт. Таблица соседей строится один раз в конструкторе.
+
+    Точный подсчёт на больших полях быстрее у BitboardSnakeEnv: его поле по
+    биту на клетку обновляется по ходу игры, а не упаковывается на каждом шаге.
+    """
+
+    def __init__(self, width: int, height: int, mode: str = "trapped", cap: Optional[int] = None):
+        if mode not in TRAP_MODES:
+            raise ValueError(f"Неизвестный режим '{mode}', ожидается один из {TRAP_MODES}")
+        if mode == "capped" and (cap is None or cap < 1):
+            raise ValueError("Для режима 'capped' нужен cap >= 1")
+
+        self.width = width
+        self.height = height
+        self.cells = width * height
+        self.mode = mode
+        self.cap = cap if mode == "capped" else self.cells
+
+        self.neighbors: List[Tuple[int, ...]] = []
+        for r in range(height):
+            for c in range(width):
+                nbrs = []
+                for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+                    nr, nc = r + dr, c + dc
+                    if 0 <= nr < height and 0 <= nc < width:
+                        nbrs.append(nr * width + nc)
+                self.neighbors.append(tuple(nbrs))
+
+    def reachable(self, grid: bytearray, head: int, tail: int) -> int:
+        """
+        Достижимые клетки в текущем режиме. Ноль во всех режимах означает,
+        что змейка в капкане, поэтому для штрафа хватает самого дешёвого "trapped".
+        """
+        if self.mode == "trapped":
+            return 0 if self.is_trapped(grid, head, tail) else 1
+        return self.count(grid, head, tail, self.cap)
+
+    def is_trapped(self, grid: bytearray, head: int, tail: int) -> bool:
+        """ Заперта, если ни один сосед головы не свободен: BFS дальше не пойдёт """
+        for nb in self.neighbors[head]:
+            if not grid[nb] or nb == tail:
+                return False
+        return True
+
+    def count(self, grid: bytearray, head: int, tail: int, cap: Optional[int] = None) -> int:
+        """ BFS по таблице соседей, останавливается, как только найдено cap клеток """
+        if cap is None:
+            cap = self.cells
+        neighbors = self.neighbors
+        visited = bytearray(self.cells)
+        visited[head] = 1
+        queue = [head]
+        found = 0
+
+        for pos in queue:  # Список растёт по ходу обхода - это и есть очередь
+            for nb in neighbors[pos]:
+                if not visited[nb] and (not grid[nb] or nb == tail):
+                    visited[nb] = 1
+                    found += 1
+                    if found >= cap:
+                        return found
+                    queue.append(nb)
+        return found
@@ -0,0 +1,241 @@
+import random
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from snake_env import DEATH_CAUSES
+from state_encoder import STATE_SIZE, StateEncoder
+
+# Смещения головы для действий: 0=ВВЕРХ, 1=ВПРАВО, 2=ВНИЗ, 3=ВЛЕВО
+ACTION_DR = np.array([-1, 0, 1, 0], dtype=np.int64)
+ACTION_DC = np.array([0, 1, 0, -1], dtype=np.int64)
+
+
+# ==============================================================================
+# ВЕКТОРИЗОВАННАЯ СРЕДА: N независимых игр SnakeEnv в массивах NumPy
+# ==============================================================================
+class VecSnakeEnv:
+    """
+    N копий SnakeEnv, которые делают шаг одновременно пакетными операциями NumPy.
+
+    Клетка поля кодируется плоским индексом r * width + c. Тело каждой змейки
+    хранится кольцевым буфером индексов (голова по head_ptr), занятость клеток -
+    булевой сеткой в формате StateEncoder (две служебные колонки за полем,
+    free_cell заодно служит "соседом" за пределами поля), свободные клетки -
+    индексом free/free_pos с удалением обменом, как в SnakeEnv. При одинаковых seed состояния, награды и флаги окончания
+    побитово совпадают с N отдельными SnakeEnv (после приведения к float32).
+    """
+
+    def __init__(self, num_envs: int, width: int = 10, height: int = 10,
+                 seeds: Optional[Sequence[Optional[int]]] = None, auto_reset: bool = True):
+        self.num_envs = num_envs
+        self.width = width
+        self.height = height
+        self.cells = width * height
+        self.auto_reset = auto_reset
+
+        if seeds is None:
+            seeds = [None] * num_envs
+        if len(seeds) != num_envs:
+            raise ValueError(f"Ожидалось {num_envs} seed, получено {len(seeds)}")
+        # У каждой игры свой генератор - еда ставится так же, как в SnakeEnv(seed=...)
+        self.rngs: List[random.Random] = [random.Random(s) for s in seeds]
+
+        n = num_envs
+        self._idx = np.arange(n)
+        self.encoder = StateEncoder(width, height)
+        self.grid = np.zeros((n, self.encoder.grid_size), dtype=bool)
+        self.body = np.zeros((n, self.cells), dtype=np.int64)
+        self.head_ptr = np.zeros(n, dtype=np.int64)
+        self.length = np.zeros(n, dtype=np.int64)
+        self.direction = np.zeros(n, dtype=np.int64)
+        self.food = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.steps_without_food = np.zeros(n, dtype=np.int64)
+        self.done = np.zeros(n, dtype=bool)
+        self.won = np.zeros(n, dtype=bool)
+        # Причина проигрыша - индекс в DEATH_CAUSES, -1 пока игра идёт или выиграна
+        self.death_cause = np.full(n, -1, dtype=np.int8)
+        self.free = np.zeros((n, self.cells), dtype=np.int64)
+        self.free_pos = np.zeros((n, self.cells), dtype=np.int64)
+        self.free_count = np.zeros(n, dtype=np.int64)
+        # Счёт последнего завершившегося эпизода каждой игры (для логов обучения)
+        self.last_scores = np.zeros(n, dtype=np.int64)
+        self.last_death_causes = np.full(n, -1, dtype=np.int8)
+
+        self._build_neighbors()
+        self.states = np.zeros((n, STATE_SIZE), dtype=np.float32)
+        self.reset()
+
+    def _build_neighbors(self):
+        """ Соседи каждой клетки для проверки тупика """
+        h, w, cells = self.height, self.width, self.cells
+        # (cells, 4), за полем - фиктивная клетка
+        self._neighbors = np.full((cells, 4), cells, dtype=np.int64)
+        self._neighbor_valid = np.zeros((cells, 4), dtype=bool)
+        for r in range(h):
+            for c in range(w):
+                for k, (dr, dc) in enumerate([(-1, 0), (1, 0), (0, -1), (0, 1)]):
+                    nr, nc = r + dr, c + dc
+                    if 0 <= nr < h and 0 <= nc < w:
+                        self._neighbors[r * w + c, k] = nr * w + nc
+                        self._neighbor_valid[r * w + c, k] = True
+
+    # --------------------------------------------------------------------------
+    def reset(self) -> np.ndarray:
+        self._reset_envs(self._idx)
+        self._encode(self._idx, self.states)
+        return self.states.copy()
+
+    def _reset_envs(self, envs: np.ndarray):
+        # Спавним змейку так же, как SnakeEnv.reset
+        r0, c0 = self.height // 2, self.width // 2
+        start = np.array([r0 * self.width + c0 + k for k in range(3)], dtype=np.int64)
+
+        self.grid[envs] = False
+        self.grid[envs, self.encoder.stop_cell] = True
+        self.free[envs] = np.arange(self.cells)
+        self.free_pos[envs] = np.arange(self.cells)
+        self.free_count[envs] = self.cells
+        for pos in start:
+            self._occupy(envs, np.full(len(envs), pos))
+        self.body[envs, :3] = start
+        self.head_ptr[envs] = 0
+        self.length[envs] = 3
+        self.direction[envs] = 3
+        self.score[envs] = 0
+        self.done[envs] = False
+        self.won[envs] = False
+        self.death_cause[envs] = -1
+        for i in envs:
+            self.food[i] = self._place_food(i)
+        self.steps_without_food[envs] = 0
+
+    def _occupy(self, envs: np.ndarray, pos: np.ndarray):
+        """ Занимает клетки pos в играх envs: сетка + удаление из индекса обменом с последним """
+        self.grid[envs, pos] = True
+        i = self.free_pos[envs, pos]
+        last = self.free[envs, self.free_count[envs] - 1]
+        self.free[envs, i] = last
+        self.free_pos[envs, last] = i
+        self.free_pos[envs, pos] = -1
+        self.free_count[envs] -= 1
+
+    def _release(self, envs: np.ndarray, pos: np.ndarray):
+        self.grid[envs, pos] = False
+        self.free[envs, self.free_count[envs]] = pos
+        self.free_pos[envs, pos] = self.free_count[envs]
+        self.free_count[envs] += 1
+
+    def _place_food(self, i: int) -> int:
+        return self.free[i, self.rngs[i].randrange(int(self.free_count[i]))]
+
+    def _tail(self, envs: np.ndarray) -> np.ndarray:
+        return self.body[envs, (self.head_ptr[envs] + self.length[envs] - 1) % self.cells]
+
+    def _encode(self, envs: np.ndarray, out: np.ndarray):
+        """ Пакетный аналог SnakeEnv._get_state для выбранных игр, пишет в out[envs] """
+        heads = self.body[envs, self.head_ptr[envs]]
+        self.encoder.encode_batch(self.grid, envs, heads, self.food[envs], out)
+
+    # --------------------------------------------------------------------------
+    def step(self, actions) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Один шаг всех игр. Возвращает (next_states, rewards, dones).
+
+        Для завершившихся игр next_states содержит терминальное состояние (его и
+        надо класть в память), а при auto_reset игра сразу перезапускается и
+        её новое начальное состояние лежит в self.states.
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        idx = self._idx
+        w, h, cells = self.width, self.height, self.cells
+        rewards = np.zeros(self.num_envs, dtype=np.float64)
+
+        active = ~self.done
+
+        # Запрет разворота в себя
+        turn = active & (np.abs(self.direction - actions) != 2)
+        self.direction = np.where(turn, actions, self.direction)
+
+        heads = self.body[idx, self.head_ptr]
+        hr, hc = heads // w, heads % w
+        fr, fc = self.food // w, self.food % w
+        nr = hr + ACTION_DR[self.direction]
+        nc = hc + ACTION_DC[self.direction]
+        self.steps_without_food[active] += 1
+
+        # Расстояние до еды ДО и ПОСЛЕ шага
+        old_dist = np.abs(hr - fr) + np.abs(hc - fc)
+        new_dist = np.abs(nr - fr) + np.abs(nc - fc)
+
+        # Условия смерти
+        max_steps = 100 + self.length * 4
+        inside = (nr >= 0) & (nr < h) & (nc >= 0) & (nc < w)
+        new_heads = np.where(inside, nr * w + nc, cells)
+        hit_body = self.grid[idx, new_heads]
+        dead = active & (~inside | hit_body | (self.steps_without_food > max_steps))
+        rewards[dead] = -20.0
+        self.death_cause[dead] = np.where(~inside, DEATH_CAUSES.index("wall"),
+                                          np.where(hit_body, DEATH_CAUSES.index("body"),
+                                                   DEATH_CAUSES.index("starvation")))[dead]
+        self.done |= dead
+
+        alive = np.flatnonzero(active & ~dead)
+        if len(alive):
+            nh = new_heads[alive]
+            self.head_ptr[alive] = (self.head_ptr[alive] - 1) % cells
+            self.body[alive, self.head_ptr[alive]] = nh
+            self._occupy(alive, nh)
+            self.length[alive] += 1
+
+            ate = nh == self.food[alive]
+            movers = alive[~ate]
+            eaters = alive[ate]
+
+            self._release(movers, self._tail(movers))
+            self.length[movers] -= 1
+            # Бонус за приближение к еде, штраф за удаление
+            rewards[movers] = np.where(new_dist[movers] < old_dist[movers], 0.2, -0.3)
+
+            self.score[eaters] += 1
+            self.steps_without_food[eaters] = 0
+            rewards[eaters] = 15.0
+
+            # Поле заполнено - победа, еду ставить некуда
+            winners = eaters[self.free_count[eaters] == 0]
+            self.won[winners] = True
+            self.done[winners] = True
+            for i in eaters[self.free_count[eaters] > 0]:
+                self.food[i] = self._place_food(i)
+            playing = ~self.won[alive]
+            alive, nh = alive[playing], nh[playing]
+
+            # Тупик: BFS из головы не найдёт ни одной клетки тогда и только тогда,
+            # когда все 4 соседа головы - стена или тело (кроме хвоста)
+            nb = self._neighbors[nh]
+            free = self._neighbor_valid[nh] & (
+                ~self.grid[alive[:, None], nb] | (nb == self._tail(alive)[:, None]))
+            trapped = ~free.any(axis=1)
+            rewards[alive[trapped]] -= 5.0
+
+        # Терминальные и уже завершённые игры тоже получают своё состояние
+        self._encode(idx, self.states)
+        next_states = self.states.copy()
+        dones = self.done.copy()
+
+        ended = dead | (active & self.won)
+        if self.auto_reset and ended.any():
+            finished = np.flatnonzero(ended)
+            self.last_scores[finished] = self.score[finished]
+            self.last_death_causes[finished] = self.death_cause[finished]
+            self._reset_envs(finished)
+            self._encode(finished, self.states)
+
+        return next_states, rewards, dones
+
+    def snake(self, i: int) -> List[Tuple[int, int]]:
+        """ Тело i-й змейки списком (r, c) от головы к хвосту, как SnakeEnv.snake """
+        ptr, length = self.head_ptr[i], self.length[i]
+        positions = self.body[i, (ptr + np.arange(length)) % self.cells]
+        return [(int(p) // self.width, int(p) % self.width) for p in positions]
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Модули проекта лежат плоско в src/ и импортируют друг друга по имени
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
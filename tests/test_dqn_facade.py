@@ -0,0 +1,108 @@
+from collections import deque
+
+import numpy as np
+import pytest
+
+from dqn_facade import NStepAccumulator
+
+GAMMA = 0.9
+
+
+def naive(stream, n: int, gamma: float, num_envs: int):
+    """ Эталон: очередь последних шагов на каждую копию, переходы собираются по одному """
+    queues = [deque() for _ in range(num_envs)]
+    out = []
+
+    def emit(queue, next_state, terminated):
+        ret = sum(gamma ** k * step[2] for k, step in enumerate(queue))
+        out.append((tuple(queue[0][0]), queue[0][1], ret, tuple(next_state), terminated))
+        queue.popleft()
+
+    for states, actions, rewards, next_states, terminated, truncated, mask in stream:
+        for i in range(num_envs):
+            if not mask[i]:
+                continue
+            queue = queues[i]
+            queue.append((states[i], actions[i], rewards[i]))
+            if len(queue) == n:
+                emit(queue, next_states[i], terminated[i])
+            if terminated[i]:
+                while queue:
+                    emit(queue, next_states[i], True)
+            elif truncated[i]:
+                queue.clear()
+    return out
+
+
+def collect(acc: NStepAccumulator, stream):
+    out = []
+    for step in stream:
+        ready = acc.push(*step)
+        if ready is not None:
+            states, actions, returns, next_states, dones = ready
+            out += [(tuple(states[k]), actions[k], returns[k], tuple(next_states[k]), dones[k])
+                    for k in range(len(states))]
+    return out
+
+
+def random_stream(steps: int, num_envs: int, state_dim: int, seed: int):
+    rng = np.random.default_rng(seed)
+    stream = []
+    for _ in range(steps):
+        terminated = rng.random(num_envs) < 0.05
+        truncated = (rng.random(num_envs) < 0.05) & ~terminated
+        stream.append((rng.random((num_envs, state_dim), dtype=np.float32), rng.integers(0, 4, num_envs),
+                       rng.random(num_envs, dtype=np.float32), rng.random((num_envs, state_dim), dtype=np.float32),
+                       terminated, truncated, rng.random(num_envs) < 0.9))
+    return stream
+
+
+def episode(length: int, terminated: bool, state_dim: int = 2):
+    """ Одна копия: состояния 0, 1, 2, ..., награды 1, 2, 3, ...; последний шаг заканчивает эпизод """
+    stream = []
+    for t in range(length):
+        last = t == length - 1
+        stream.append((np.full((1, state_dim), t, np.float32), np.array([t % 4]), np.array([t + 1.0]),
+                       np.full((1, state_dim), t + 1, np.float32), np.array([last and terminated]),
+                       np.array([last and not terminated]), None))
+    return stream
+
+
+# ==============================================================================
+# NStepAccumulator
+# ==============================================================================
+@pytest.mark.parametrize("n", [1, 2, 3, 5])
+def test_matches_naive_deque(n):
+    num_envs, state_dim = 6, 3
+    stream = random_stream(400, num_envs, state_dim, seed=n)
+    got = collect(NStepAccumulator(num_envs, state_dim, n, GAMMA), stream)
+    expected = naive(stream, n, GAMMA, num_envs)
+
+    # Порядок внутри шага у пачки другой (по длине окна, а не по копии)
+    key = lambda t: (t[0], t[3], t[1])
+    got, expected = sorted(got, key=key), sorted(expected, key=key)
+    assert len(got) == len(expected)
+    for g, e in zip(got, expected):
+        assert g[:2] == e[:2] and g[3:] == e[3:]
+        assert g[2] == pytest.approx(e[2], rel=1e-5)
+
+
+def test_terminated_flushes_short_windows():
+    got = collect(NStepAccumulator(1, 2, 3, GAMMA), episode(2, terminated=True))
+    # Эпизод короче n: оба укороченных окна уходят сразу с done и без бутстрапа
+    assert [(s[0], a, d) for s, a, _, _, d in got] == [(0.0, 0, True), (1.0, 1, True)]
+    assert [r for _, _, r, _, _ in got] == pytest.approx([1.0 + GAMMA * 2.0, 2.0])
+    assert all(ns == (2.0, 2.0) for _, _, _, ns, _ in got)
+
+
+def test_truncated_drops_short_tail():
+    acc = NStepAccumulator(1, 2, 3, GAMMA)
+    assert collect(acc, episode(2, terminated=False)) == []
+
+    got = collect(acc, episode(4, terminated=False))
+    # Полные окна с шагов 0 и 1 остаются (с бутстрапом, done=False), хвост из шагов 2-3 отброшен
+    assert [(s[0], ns[0], d) for s, _, _, ns, d in got] == [(0.0, 3.0, False), (1.0, 4.0, False)]
+    assert [r for _, _, r, _, _ in got] == pytest.approx([1 + 2 * GAMMA + 3 * GAMMA ** 2,
+                                                          2 + 3 * GAMMA + 4 * GAMMA ** 2])
+    # Новый эпизод начинается с пустой истории
+    assert collect(acc, episode(2, terminated=True))[0][0] == (0.0, 0.0)
@@ -0,0 +1,103 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+from episode_log import (EpisodeLog, _read_varint, _unzigzag, _write_varint, _zigzag, pack_actions,
+                         replay_transitions, unpack_actions)
+from snake_env import SnakeEnv
+
+MOVES = [(-1, 0), (0, 1), (1, 0), (0, -1)]
+
+
+def play(seed: int, rng: random.Random, width: int = 10, height: int = 10):
+    """ Эпизод случайной политики, которая не врезается сразу: (действия, переходы, счёт) """
+    env = SnakeEnv(width, height)
+    state = env.reset(seed)
+    actions, transitions = [], []
+    while not env.done:
+        hr, hc = env.snake[0]
+        safe = [a for a, (dr, dc) in enumerate(MOVES)
+                if 0 <= hr + dr < height and 0 <= hc + dc < width and (hr + dr, hc + dc) not in env.snake]
+        action = rng.choice(safe) if safe else rng.randint(0, 3)
+        next_state, reward, done = env.step(action)
+        actions.append(action)
+        transitions.append((state, action, reward, next_state, done))
+        state = next_state
+    return actions, transitions, env.score
+
+
+# ==============================================================================
+# УПАКОВКА
+# ==============================================================================
+@pytest.mark.parametrize("value", [0, 1, 127, 128, 300, 16383, 16384, 2 ** 32 - 1, 2 ** 63 + 5])
+def test_varint_round_trip(value):
+    out = bytearray(b"\xff")  # Чтение с ненулевой позиции
+    _write_varint(out, value)
+    assert _read_varint(out, 1) == (value, len(out))
+    assert len(out) - 1 == max(1, -(-value.bit_length() // 7))
+
+
+@pytest.mark.parametrize("value", [0, 1, -1, 2, -2, 63, -64, 2 ** 31 - 1, -2 ** 31, 10 ** 15, -10 ** 15])
+def test_zigzag_round_trip(value):
+    encoded = _zigzag(value)
+    assert encoded >= 0 and _unzigzag(encoded) == value
+    # Малые по модулю числа любого знака - короткие varint
+    assert encoded <= 2 * abs(value)
+
+
+@pytest.mark.parametrize("steps", [0, 1, 2, 3, 4, 5, 7, 8, 9, 1001])
+def test_pack_unpack_round_trip(steps):
+    actions = np.random.default_rng(steps).integers(0, 4, steps)
+    packed = pack_actions(actions)
+    assert len(packed) == (steps + 3) // 4
+    assert np.array_equal(unpack_actions(packed, steps), actions)
+
+
+# ==============================================================================
+# ЖУРНАЛ
+# ==============================================================================
+def test_log_round_trip(tmp_path):
+    path = str(tmp_path / "episodes.snk")
+    records = [(-3, [0, 1, 2]), (0, []), (2 ** 40, [3] * 5), (-2 ** 40, [1, 0, 3, 2, 2, 1, 0])]
+    with EpisodeLog(path, 12, 7) as log:
+        for k, (seed, actions) in enumerate(records):
+            log.append(seed, actions, k)
+        assert len(log) == len(records)  # Чтение сразу после записи, без close()
+
+    with EpisodeLog(path, create=False) as log:
+        assert (log.width, log.height) == (12, 7)
+        assert log.index["score"].tolist() == list(range(len(records)))
+        assert log.index["steps"].tolist() == [len(actions) for _, actions in records]
+        for k, (seed, actions) in enumerate(records):
+            got_seed, got_actions = log.episode(k)
+            assert got_seed == seed and got_actions.tolist() == actions
+
+
+def test_open_missing_log_creates_nothing(tmp_path):
+    path = str(tmp_path / "missing.snk")
+    with pytest.raises(FileNotFoundError):
+        EpisodeLog(path, create=False)
+    assert os.listdir(tmp_path) == []
+
+
+def test_replay_transitions_matches_played_episodes(tmp_path):
+    rng = random.Random(0)
+    seeds = [-7, 0, 5, 123456789]
+    episodes = [play(seed, rng) for seed in seeds]
+    with EpisodeLog(str(tmp_path / "episodes.snk")) as log:
+        for seed, (actions, _, score) in zip(seeds, episodes):
+            log.append(seed, actions, score)
+        states, actions, rewards, next_states, dones = replay_transitions(log, range(len(seeds)))
+
+    # replay_transitions идёт по шагам: на шаге t - все эпизоды, которые ещё не кончились
+    expected = [episode[1][t] for t in range(max(len(e[1]) for e in episodes))
+                for episode in episodes if t < len(episode[1])]
+    assert len(states) == len(expected) == sum(len(e[0]) for e in episodes)
+    assert np.array_equal(states, np.array([e[0] for e in expected]))
+    assert actions.tolist() == [e[1] for e in expected]
+    assert np.allclose(rewards, [e[2] for e in expected])
+    assert np.array_equal(next_states, np.array([e[3] for e in expected]))
+    assert dones.tolist() == [e[4] for e in expected]
+    assert dones.sum() == len(seeds)
@@ -0,0 +1,90 @@
+import random
+
+import numpy as np
+import pytest
+
+from lookahead import LookaheadPolicy
+from snake_env import SnakeEnv
+
+MOVES = [(-1, 0), (0, 1), (1, 0), (0, -1)]
+
+
+def to_food(env: SnakeEnv, rng: random.Random) -> int:
+    """ Безопасный ход поближе к еде (чтобы змейка ела и генератор еды работал) """
+    hr, hc = env.snake[0]
+    fr, fc = env.food
+    safe = [a for a, (dr, dc) in enumerate(MOVES)
+            if 0 <= hr + dr < env.height and 0 <= hc + dc < env.width and (hr + dr, hc + dc) not in env.snake]
+    if not safe:
+        return rng.randint(0, 3)
+    return min(safe, key=lambda a: (abs(hr + MOVES[a][0] - fr) + abs(hc + MOVES[a][1] - fc), rng.random()))
+
+
+def run(env: SnakeEnv, actions):
+    trace = []
+    for action in actions:
+        state, reward, done = env.step(action)
+        trace.append((state, reward, done, env.food, env.score))
+        if done:
+            break
+    return trace
+
+
+def play_out(env: SnakeEnv, rng: random.Random, steps: int):
+    actions = []
+    for _ in range(steps):
+        if env.done:
+            break
+        actions.append(to_food(env, rng))
+        env.step(actions[-1])
+    return actions
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_restore_replays_identically_in_another_env(seed):
+    rng = random.Random(seed)
+    game = SnakeEnv(10, 10, seed=seed)
+    play_out(game, rng, 20)
+    snap = game.snapshot()
+
+    actions = play_out(game, rng, 300)
+    assert game.score >= 3  # Еда ставилась несколько раз после снимка
+
+    # Свежая среда с другим seed и другой историей: после restore всё решает снимок
+    other = SnakeEnv(10, 10, seed=seed + 100)
+    play_out(other, random.Random(-1), 50)
+    other.restore(snap)
+    replayed = run(other, actions)
+
+    game.restore(snap)
+    original = run(game, actions)
+
+    assert len(replayed) == len(original) == len(actions)
+    for (s1, r1, d1, f1, c1), (s2, r2, d2, f2, c2) in zip(replayed, original):
+        assert np.array_equal(s1, s2)
+        assert (r1, d1, f1, c1) == (r2, d2, f2, c2)
+    assert other.snapshot()[:-1] == game.snapshot()[:-1]
+    assert other.rng.getstate() == game.rng.getstate()
+
+
+@pytest.mark.parametrize("peek_food", [True, False])
+def test_plan_leaves_game_untouched(peek_food):
+    rng = random.Random(0)
+    weights = np.random.default_rng(0).standard_normal((20, 4)).astype(np.float32)
+    planner = LookaheadPolicy(lambda states: states @ weights, depth=3, peek_food=peek_food)
+    game = SnakeEnv(8, 8, seed=1)
+    play_out(game, rng, 10)
+    before = game.snapshot()
+    state = game._get_state()
+
+    planner.plan(game)
+    assert planner.nodes > 0
+    assert game.snapshot()[:-1] == before[:-1]
+    assert game.rng.getstate() == before[-1]
+    assert np.array_equal(game._get_state(), state)
+
+
+@pytest.mark.parametrize("depth", [0, -1])
+def test_rejects_depth_below_one(depth):
+    with pytest.raises(ValueError):
+        LookaheadPolicy(lambda states: states, depth)
@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+from replay_buffer import PrioritizedReplayBuffer, ReplayBuffer, SumTree
+
+
+def fill(buffer: ReplayBuffer, n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    buffer.add_batch(rng.random((n, buffer.state_dim), dtype=np.float32), rng.integers(0, 4, n),
+                     rng.random(n, dtype=np.float32), rng.random((n, buffer.state_dim), dtype=np.float32),
+                     rng.random(n) < 0.1)
+
+
+def internal_sums_ok(tree: SumTree) -> bool:
+    nodes = np.arange(1, tree.leaves)
+    return np.allclose(tree.tree[nodes], tree.tree[2 * nodes] + tree.tree[2 * nodes + 1])
+
+
+# ==============================================================================
+# SumTree
+# ==============================================================================
+def test_sum_tree_update_and_find():
+    tree = SumTree(5)  # Листьев 8, последние три пустые
+    priorities = np.array([1.0, 2.0, 0.0, 3.0, 4.0])
+    tree.update(np.arange(5), priorities)
+    assert tree.total == pytest.approx(10.0) and internal_sums_ok(tree)
+
+    # Границы отрезков префиксных сумм: [0,1) -> 0, [1,3) -> 1, [3,6) -> 3, [6,10) -> 4
+    values = np.array([0.0, 0.999, 1.0, 2.999, 3.0, 5.999, 6.0, 9.999])
+    assert tree.find(values).tolist() == [0, 0, 1, 1, 3, 3, 4, 4]
+
+
+def test_sum_tree_duplicate_index_update():
+    tree = SumTree(8)
+    tree.update(np.arange(8), np.ones(8))
+    tree.update(np.array([3, 5, 3]), np.array([10.0, 2.0, 7.0]))
+    assert tree.get(np.array([3, 5])).tolist() == [7.0, 2.0]  # Остаётся последний приоритет
+    assert tree.total == pytest.approx(6 + 7.0 + 2.0) and internal_sums_ok(tree)
+
+
+def test_sum_tree_set_matches_update():
+    a, b = SumTree(13), SumTree(13)
+    rng = np.random.default_rng(0)
+    priorities = rng.random(13)
+    for i, p in enumerate(priorities):
+        a.set(i, p)
+    b.update(np.arange(13), priorities)
+    assert np.allclose(a.tree, b.tree)
+
+
+# ==============================================================================
+# PrioritizedReplayBuffer
+# ==============================================================================
+def test_per_sampling_is_proportional():
+    alpha = 0.6
+    buffer = PrioritizedReplayBuffer(16, seed=0, alpha=alpha, eps=0.0)
+    fill(buffer, 10)
+    td_errors = np.arange(1, 11, dtype=np.float64)
+    buffer.update_priorities(np.arange(10), td_errors)
+
+    counts = np.zeros(10)
+    for _ in range(400):
+        counts += np.bincount(buffer.sample_indices(500), minlength=10)[:10]
+    expected = td_errors ** alpha / (td_errors ** alpha).sum()
+    assert np.abs(counts / counts.sum() - expected).max() < 0.005
+
+
+def test_per_new_transitions_get_max_priority():
+    buffer = PrioritizedReplayBuffer(8, seed=0, eps=0.0)
+    fill(buffer, 4)
+    buffer.update_priorities(np.arange(4), np.array([0.5, 3.0, 1.0, 2.0]))
+    fill(buffer, 1, seed=1)
+    assert buffer.tree.get(np.array([4]))[0] == pytest.approx(3.0 ** buffer.alpha)
+
+
+def test_per_importance_weights():
+    beta = 0.4
+    buffer = PrioritizedReplayBuffer(8, seed=0, eps=0.0)
+    fill(buffer, 6)
+    buffer.update_priorities(np.arange(6), np.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0]))
+    idx = np.array([0, 2, 5, 5])
+    weights = buffer.weights(idx, beta).numpy()
+
+    probs = buffer.tree.get(idx) / buffer.tree.total
+    expected = (6 * probs) ** -beta
+    assert np.allclose(weights, expected / expected.max(), rtol=1e-6)
+    assert weights.max() == pytest.approx(1.0) and weights[0] == weights.max()  # Редкий переход - наибольший вес
+
+
+# ==============================================================================
+# ФАЙЛ: flush / open
+# ==============================================================================
+@pytest.mark.parametrize("buffer_class", [ReplayBuffer, PrioritizedReplayBuffer])
+def test_flush_open_round_trip(tmp_path, buffer_class):
+    path = str(tmp_path / "memory.bin")
+    buffer = buffer_class(50, state_dim=7, path=path, seed=0)
+    fill(buffer, 70)  # Больше ёмкости: курсор успел обернуться
+    buffer.flush()
+
+    restored = buffer_class.open(path, seed=0)
+    assert (restored.capacity, restored.state_dim, restored.cursor, len(restored)) == (50, 7, 20, 50)
+    for field in ("states", "actions", "rewards", "next_states", "dones"):
+        assert np.array_equal(getattr(restored, field), getattr(buffer, field))
+
+    # Тот же seed - та же выборка
+    batch, restored_batch = buffer.sample(16), restored.sample(16)
+    for a, b in zip(batch, restored_batch):
+        assert np.array_equal(a.numpy(), b.numpy())
+    if buffer_class is PrioritizedReplayBuffer:
+        assert np.allclose(restored.tree.get(np.arange(50)), 1.0)  # Приоритеты не хранятся: равные
+
+
+def test_open_rejects_foreign_file(tmp_path):
+    path = tmp_path / "junk.bin"
+    path.write_bytes(b"\x00" * 128)
+    with pytest.raises(ValueError):
+        ReplayBuffer.open(str(path))
@@ -0,0 +1,320 @@
+import random
+from collections import deque
+from typing import List, Tuple
+
+import numpy as np
+import pytest
+
+from bitboard_env import BitboardSnakeEnv
+from snake_env import DEATH_CAUSES, SnakeEnv
+from vec_snake_env import VecSnakeEnv
+
+
+# ==============================================================================
+# ЭТАЛОН: SnakeEnv до перехода на deque и сетку занятости (без изменений)
+# ==============================================================================
+class LegacySnakeEnv:
+    def __init__(self, width: int = 10, height: int = 10):
+        self.width = width
+        self.height = height
+        self.reset()
+
+    def reset(self) -> List[float]:
+        # Спавним змейку так, чтобы сзади было место
+        self.snake: List[Tuple[int, int]] = [
+            (self.height // 2, self.width // 2),
+            (self.height // 2, self.width // 2 + 1),
+            (self.height // 2, self.width // 2 + 2)
+        ]
+        self.direction = 3  # 0=ВВЕРХ, 1=ВПРАВО, 2=ВНИЗ, 3=ВЛЕВО
+        self.score = 0
+        self.done = False
+        self.food: Tuple[int, int] = self._place_food()
+        self.steps_without_food = 0
+        return self._get_state()
+
+    def _place_food(self) -> Tuple[int, int]:
+        while True:
+            food = (random.randint(0, self.height - 1), random.randint(0, self.width - 1))
+            if food not in self.snake:
+                return food
+
+    def _count_reachable_cells(self) -> int:
+        """ BFS для проверки, не заперта ли змейка """
+        if not self.snake: return 0
+        head = self.snake[0]
+        obstacles = set(self.snake[:-1])  # Хвост может уйти, его не считаем жестким блоком
+
+        queue = deque([head])
+        visited = {head}
+
+        while queue:
+            r, c = queue.popleft()
+            for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+                nr, nc = r + dr, c + dc
+                if 0 <= nr < self.height and 0 <= nc < self.width:
+                    if (nr, nc) not in obstacles and (nr, nc) not in visited:
+                        visited.add((nr, nc))
+                        queue.append((nr, nc))
+        return len(visited) - 1
+
+    def _get_state(self) -> List[float]:
+        hr, hc = self.snake[0]
+
+        # 8 направлений: N, NE, E, SE, S, SW, W, NW
+        directions = [
+            (-1, 0), (-1, 1), (0, 1), (1, 1),
+            (1, 0), (1, -1), (0, -1), (-1, -1)
+        ]
+
+        state = []
+
+        # Для каждого направления ищем расстояние до стены и до тела
+        for dr, dc in directions:
+            r, c = hr + dr, hc + dc
+            dist = 1.0
+            wall_dist = 0.0
+            body_dist = 0.0
+
+            while 0 <= r < self.height and 0 <= c < self.width:
+                if (r, c) in self.snake and body_dist == 0.0:
+                    body_dist = 1.0 / dist  # Близость к телу
+                r += dr
+                c += dc
+                dist += 1.0
+
+            wall_dist = 1.0 / dist  # Близость к стене
+            state.extend([wall_dist, body_dist])
+
+        # Направление движения еды относительно головы (4 признака)
+        state.append(1.0 if self.food[0] < hr else 0.0)  # Еда выше
+        state.append(1.0 if self.food[0] > hr else 0.0)  # Еда ниже
+        state.append(1.0 if self.food[1] < hc else 0.0)  # Еда левее
+        state.append(1.0 if self.food[1] > hc else 0.0)  # Еда правее
+
+        return state  # Итого: 8*2 + 4 = 20 признаков
+
+    def step(self, action: int) -> Tuple[List[float], float, bool]:
+        if self.done:
+            return self._get_state(), 0.0, True
+
+        # Запрет разворота в себя
+        if abs(self.direction - action) != 2:
+            self.direction = action
+
+        hr, hc = self.snake[0]
+        if self.direction == 0:
+            hr -= 1
+        elif self.direction == 1:
+            hc += 1
+        elif self.direction == 2:
+            hr += 1
+        elif self.direction == 3:
+            hc -= 1
+
+        new_head = (hr, hc)
+        self.steps_without_food += 1
+
+        # Считаем расстояние до еды ДО шага
+        old_dist = abs(self.snake[0][0] - self.food[0]) + abs(self.snake[0][1] - self.food[1])
+
+        # Условия смерти
+        max_steps = 100 + len(self.snake) * 4  # Увеличим лимит для больших размеров
+        if (hr < 0 or hr >= self.height or hc < 0 or hc >= self.width or
+                new_head in self.snake or self.steps_without_food > max_steps):
+            self.done = True
+            return self._get_state(), -20.0, True  # Штраф умеренный, чтобы не забивать другие Q-значения
+
+        self.snake.insert(0, new_head)
+
+        # Считаем расстояние ПОСЛЕ шага
+        new_dist = abs(new_head[0] - self.food[0]) + abs(new_head[1] - self.food[1])
+
+        if new_head == self.food:
+            self.score += 1
+            self.food = self._place_food()
+            self.steps_without_food = 0
+            reward = 15.0  # Стимул расти
+        else:
+            self.snake.pop()
+            # Бонус за приближение к еде, штраф за удаление
+            reward = 0.2 if new_dist < old_dist else -0.3
+
+        # Проверка на тупик через BFS
+        if self._count_reachable_cells() == 0:
+            reward -= 5.0  # Штраф за попадание в глухой капкан
+
+        return self._get_state(), reward, False
+
+
+class BoardFull(Exception):
+    """ Эталону некуда ставить еду: он зациклился бы, новая среда объявляет победу """
+
+
+class LinkedLegacyEnv(LegacySnakeEnv):
+    """
+    Эталон, который ставит еду туда же, куда новая среда: генераторы у них
+    разные (глобальный random против seed'а среды), а правила игры одни.
+    Инвариант эталона - еда не на теле - проверяется на каждой постановке.
+    """
+
+    def __init__(self, source: SnakeEnv):
+        self.source = source
+        super().__init__(source.width, source.height)
+
+    def _place_food(self) -> Tuple[int, int]:
+        if self.source.won:
+            raise BoardFull
+        food = self.source.food
+        assert food not in self.snake
+        return food
+
+
+# ==============================================================================
+# ПОЛИТИКИ ДЛЯ ПРОГОНОВ
+# ==============================================================================
+MOVES = [(-1, 0), (0, 1), (1, 0), (0, -1)]
+
+
+def greedy(snake, food, width: int, height: int, rng: random.Random, eps: float = 0.05) -> int:
+    """ К еде по безопасным клеткам, иногда случайный ход (чтобы встречались все виды смерти) """
+    if rng.random() < eps:
+        return rng.randint(0, 3)
+    hr, hc = snake[0]
+    body = set(list(snake)[:-1])
+    closer, safe = [], []
+    for action, (dr, dc) in enumerate(MOVES):
+        r, c = hr + dr, hc + dc
+        if 0 <= r < height and 0 <= c < width and (r, c) not in body:
+            safe.append(action)
+            if abs(r - food[0]) + abs(c - food[1]) < abs(hr - food[0]) + abs(hc - food[1]):
+                closer.append(action)
+    return rng.choice(closer or safe or [rng.randint(0, 3)])
+
+
+def hamiltonian(snake, food, width: int, height: int, rng: random.Random) -> int:
+    """
+    Обход гамильтонова цикла, согласованного со стартом (height кратна 4):
+    столбец 0 - спуск, остальные строки змейкой, стартовая строка идёт влево.
+    Такая змейка гарантированно заполняет всё поле.
+    """
+    r, c = snake[0]
+    if c == 0:
+        return 2 if r < height - 1 else 1
+    if (r - height // 2) % 2 == 0:
+        return 0 if c == 1 and r > 0 else 3
+    return 0 if c == width - 1 else 1
+
+
+def play(env: SnakeEnv, policy, rng: random.Random, max_steps: int = 5000):
+    """ Эпизод новой среды вместе с эталоном; проверка после каждого шага """
+    legacy = LinkedLegacyEnv(env)
+    assert np.array_equal(env._get_state(), np.asarray(legacy._get_state(), dtype=np.float32))
+    for _ in range(max_steps):
+        action = policy(env.snake, env.food, env.width, env.height, rng)
+        state, reward, done = env.step(action)
+        try:
+            legacy_state, legacy_reward, legacy_done = legacy.step(action)
+        except BoardFull:
+            assert env.won and done and reward == 15.0
+            assert list(env.snake) == legacy.snake and len(env.snake) == env.width * env.height
+            return
+        assert np.array_equal(state, np.asarray(legacy_state, dtype=np.float32))
+        assert reward == legacy_reward and done == legacy_done
+        assert list(env.snake) == legacy.snake and env.food == legacy.food
+        assert env.score == legacy.score and env.direction == legacy.direction
+        if done:
+            assert not env.won and env.death_cause in DEATH_CAUSES
+            return
+    pytest.fail("эпизод не закончился")
+
+
+# ==============================================================================
+# SnakeEnv ПРОТИВ ЭТАЛОНА
+# ==============================================================================
+@pytest.mark.parametrize("width,height", [(10, 10), (7, 12), (5, 5), (20, 13)])
+@pytest.mark.parametrize("trap_mode", ["trapped", "count"])
+def test_matches_legacy(width, height, trap_mode):
+    causes = set()
+    for seed in range(25):
+        env = SnakeEnv(width, height, seed=seed, trap_mode=trap_mode)
+        play(env, greedy, random.Random(seed))
+        causes.add(env.death_cause)
+    assert causes >= {"wall", "body"}
+
+
+@pytest.mark.parametrize("width,height", [(5, 4), (6, 4), (8, 8)])
+def test_matches_legacy_until_board_full(width, height):
+    env = SnakeEnv(width, height, seed=0)
+    play(env, hamiltonian, random.Random(0))
+    assert env.won and env.death_cause is None and env.score == width * height - 3
+
+
+# ==============================================================================
+# VecSnakeEnv И BitboardSnakeEnv ПРОТИВ SnakeEnv
+# ==============================================================================
+@pytest.mark.parametrize("width,height,policy,steps", [
+    (10, 10, greedy, 600), (7, 12, greedy, 600), (5, 5, greedy, 800), (6, 4, hamiltonian, 300),
+])
+def test_vec_matches_snake_env(width, height, policy, steps):
+    seeds = list(range(16))
+    vec = VecSnakeEnv(len(seeds), width, height, seeds=seeds)
+    envs = [SnakeEnv(width, height, seed=seed) for seed in seeds]
+    rng = random.Random(0)
+    wins = 0
+    for _ in range(steps):
+        actions = [policy(env.snake, env.food, width, height, rng) for env in envs]
+        states, rewards, dones = vec.step(actions)
+        for i, env in enumerate(envs):
+            state, reward, done = env.step(actions[i])
+            assert np.array_equal(state, states[i]) and reward == rewards[i] and done == dones[i]
+            if done:
+                assert vec.last_scores[i] == env.score
+                cause = vec.last_death_causes[i]
+                assert (DEATH_CAUSES[cause] if cause >= 0 else None) == env.death_cause
+                wins += env.won
+                env.reset()  # VecSnakeEnv сбрасывает копию сам, тем же генератором
+            assert vec.snake(i) == list(env.snake) and divmod(int(vec.food[i]), width) == env.food
+    if policy is hamiltonian:
+        assert wins > 0
+
+
+@pytest.mark.parametrize("width,height", [(10, 10), (7, 5), (20, 13), (6, 4)])
+@pytest.mark.parametrize("trap_mode", ["trapped", "count"])
+def test_bitboard_matches_snake_env(width, height, trap_mode):
+    wins = 0
+    for seed in range(10):
+        policy = hamiltonian if height % 4 == 0 and seed % 2 else greedy
+        env = SnakeEnv(width, height, seed=seed, trap_mode=trap_mode)
+        board = BitboardSnakeEnv(width, height, seed=seed, trap_mode=trap_mode)
+        assert np.array_equal(env._get_state(), board._get_state())
+        rng = random.Random(seed)
+        done = False
+        while not done:
+            action = policy(env.snake, env.food, width, height, rng)
+            state, reward, done = env.step(action)
+            board_state, board_reward, board_done = board.step(action)
+            assert np.array_equal(state, board_state) and reward == board_reward and done == board_done
+            assert list(env.snake) == list(board.snake) and env.food == board.food
+            assert env.death_cause == board.death_cause and env.won == board.won
+            if trap_mode == "count" and not done:
+                assert env._count_reachable_cells() == board._count_reachable_cells()
+        wins += env.won
+    if height % 4 == 0:
+        assert wins > 0
+
+
+@pytest.mark.parametrize("env_class", [SnakeEnv, BitboardSnakeEnv])
+def test_reset_seed_matches_fresh_env(env_class):
+    """ Эпизод reset(seed) не зависит от истории среды и совпадает с первым эпизодом env_class(seed=seed) """
+    env = env_class(10, 10, seed=123)
+    rng = random.Random(0)
+    for seed in range(20):
+        for _ in range(rng.randint(0, 50)):
+            env.step(rng.randint(0, 3))
+        fresh = env_class(10, 10, seed=seed)
+        assert np.array_equal(env.reset(seed), fresh._get_state())
+        for _ in range(200):
+            action = greedy(fresh.snake, fresh.food, 10, 10, rng)
+            assert np.array_equal(env.step(action)[0], fresh.step(action)[0])
+            assert list(env.snake) == list(fresh.snake) and env.food == fresh.food